@@ -74,7 +74,7 @@ def setup_python_environment():
     
     # Install test dependencies
     if not run_command(
-        "pip install pytest pytest-asyncio pytest-mock httpx",
+        "pip install pytest pytest-asyncio pytest-mock pytest-xdist httpx",
         cwd=server_dir,
         description="Installing test dependencies"
     ):
@@ -88,9 +88,9 @@ def run_backend_tests():
     
     server_dir = Path(__file__).parent / "server"
     
-    # Run pytest with coverage
+    # Run pytest across all cores; each worker gets its own in-memory test database
     return run_command(
-        "python -m pytest tests/ -v --tb=short",
+        "python -m pytest tests/ -v --tb=short -n auto",
         cwd=server_dir,
         description="Running backend tests"
     )
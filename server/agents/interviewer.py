@@ -6,7 +6,7 @@ from datetime import datetime
 from sqlalchemy.orm import Session
 
 from llm.provider_abstraction import provider_manager
-from storage.db import InterviewRepository, QuestionRepository, Turn
+from storage.db import InterviewRepository, QuestionRepository
 from graders.hybrid import HybridGrader
 
 class InterviewState(Enum):
@@ -24,6 +24,12 @@ class InterviewAgent:
     with adaptive difficulty and comprehensive coverage tracking.
     """
     
+    # Configuration only; per-interview state lives in the database
+    __slots__ = (
+        "coverage_skills", "skill_categories", "_core_skills", "_core_question_skills",
+        "max_turns", "time_limit_minutes", "grader"
+    )
+    
     def __init__(self):
         self.coverage_skills = [
             "references", "ranges", "formatting", "if_functions", "vlookup",
@@ -40,13 +46,18 @@ class InterviewAgent:
             "charts": ["charts"]
         }
         
+        # Foundations and functions gate every move out of CORE_Q; built once instead of per turn
+        self._core_skills = tuple(self.skill_categories["foundations"] + self.skill_categories["functions"])
+        # Pool CORE_Q questions are drawn from
+        self._core_question_skills = self._core_skills + tuple(self.skill_categories["data_ops"])
+        
         self.max_turns = 25
         self.time_limit_minutes = 45
         self.grader = HybridGrader()
     
     def start_interview(self, interview_id: int) -> Dict[str, Any]:
         """Start a new interview session"""
-        coverage_vector = {skill: 0 for skill in self.coverage_skills}
+        coverage_vector = dict.fromkeys(self.coverage_skills, 0)
         
         question = """Hello! I'm your Excel interviewer today. I'll be conducting a comprehensive assessment of your Excel skills across various areas including formulas, data analysis, and chart creation.
 
@@ -74,7 +85,7 @@ Let's start with a brief introduction: Could you tell me about your experience w
             raise ValueError("Interview not found")
         
         # Get turn count
-        turn_count = len(interview.turns)
+        turn_count = repo.count_turns(interview_id)
         
         # Check termination conditions
         if turn_count >= self.max_turns:
@@ -91,7 +102,9 @@ Let's start with a brief introduction: Could you tell me about your experience w
         
         # Get current state and coverage
         state = InterviewState(current_state)
-        coverage_vector = interview.coverage_vector or {skill: 0 for skill in self.coverage_skills}
+        # Work on a copy: the JSON column isn't mutation-tracked, so updating the loaded
+        # dict in place would never be written back
+        coverage_vector = dict(interview.coverage_vector or dict.fromkeys(self.coverage_skills, 0))
         
         # Grade the previous answer if applicable
         if turn_count > 1:
@@ -106,36 +119,34 @@ Let's start with a brief introduction: Could you tell me about your experience w
     def _state_transition(self, current_state: InterviewState, interview_id: int, 
                          coverage_vector: Dict[str, int], db: Session) -> Dict[str, Any]:
         """Handle state transitions and generate appropriate questions"""
-        
-        if current_state == InterviewState.INTRO:
-            return self._transition_to_calibrate(coverage_vector, db)
-        
-        elif current_state == InterviewState.CALIBRATE:
-            return self._transition_to_core(coverage_vector, db)
-        
-        elif current_state == InterviewState.CORE_Q:
-            # Check if we need deep dive or continue with core questions
-            if self._needs_deep_dive(coverage_vector):
-                return self._transition_to_deep_dive(coverage_vector, db)
-            elif self._core_coverage_sufficient(coverage_vector):
-                return self._transition_to_case(coverage_vector)
-            else:
-                return self._continue_core_questions(coverage_vector, db)
-        
-        elif current_state == InterviewState.DEEP_DIVE:
-            if self._deep_dive_complete(coverage_vector):
-                return self._transition_to_case(coverage_vector)
-            else:
-                return self._continue_deep_dive(coverage_vector, db)
-        
-        elif current_state == InterviewState.CASE:
-            return self._transition_to_review(coverage_vector)
-        
-        elif current_state == InterviewState.REVIEW:
-            return self._transition_to_summary()
-        
-        else:
+        handler = self._STATE_HANDLERS.get(current_state)
+        if handler is None:
             return self._end_interview("Interview complete")
+        return handler(self, coverage_vector, db)
+    
+    def _after_core_question(self, coverage_vector: Dict[str, int], db: Session) -> Dict[str, Any]:
+        """Check if we need deep dive or continue with core questions"""
+        if self._needs_deep_dive(coverage_vector):
+            return self._transition_to_deep_dive(coverage_vector, db)
+        elif self._core_coverage_sufficient(coverage_vector):
+            return self._transition_to_case(coverage_vector)
+        else:
+            return self._continue_core_questions(coverage_vector, db)
+    
+    def _after_deep_dive(self, coverage_vector: Dict[str, int], db: Session) -> Dict[str, Any]:
+        """Move to the case study once enough analysis skills are covered"""
+        if self._deep_dive_complete(coverage_vector):
+            return self._transition_to_case(coverage_vector)
+        else:
+            return self._continue_deep_dive(coverage_vector, db)
+    
+    def _after_case(self, coverage_vector: Dict[str, int], db: Session) -> Dict[str, Any]:
+        """Case study is followed by the review question"""
+        return self._transition_to_review(coverage_vector)
+    
+    def _after_review(self, coverage_vector: Dict[str, int], db: Session) -> Dict[str, Any]:
+        """Review is the last question before the summary"""
+        return self._transition_to_summary()
     
     def _transition_to_calibrate(self, coverage_vector: Dict[str, int], db: Session) -> Dict[str, Any]:
         """Transition to calibration with a basic formula question"""
@@ -162,7 +173,7 @@ Let's start with a brief introduction: Could you tell me about your experience w
             
             # Update coverage for calibration skill
             skill = parsed.get("target_skill", "references")
-            coverage_vector[skill] = max(coverage_vector.get(skill, 0), 1)
+            self._update_skill_coverage(coverage_vector, skill, 1)
             
             return {
                 "state": InterviewState.CALIBRATE.value,
@@ -190,7 +201,7 @@ Let's start with a brief introduction: Could you tell me about your experience w
     def _transition_to_core(self, coverage_vector: Dict[str, int], db: Session) -> Dict[str, Any]:
         """Transition to core questions based on coverage gaps"""
         # Find skill with lowest coverage in foundations/functions
-        priority_skills = self.skill_categories["foundations"] + self.skill_categories["functions"]
+        priority_skills = self._core_skills
         uncovered_skills = [skill for skill in priority_skills if coverage_vector.get(skill, 0) == 0]
         
         if uncovered_skills:
@@ -200,7 +211,7 @@ Let's start with a brief introduction: Could you tell me about your experience w
             target_skill = min(priority_skills, key=lambda x: coverage_vector.get(x, 0))
         
         question = self._generate_skill_question(target_skill, difficulty=2)
-        coverage_vector[target_skill] = max(coverage_vector.get(target_skill, 0), 2)
+        self._update_skill_coverage(coverage_vector, target_skill, 2)
         
         return {
             "state": InterviewState.CORE_Q.value,
@@ -215,7 +226,7 @@ Let's start with a brief introduction: Could you tell me about your experience w
     def _continue_core_questions(self, coverage_vector: Dict[str, int], db: Session) -> Dict[str, Any]:
         """Continue with core questions for uncovered skills"""
         # Find next skill to test
-        all_skills = self.skill_categories["foundations"] + self.skill_categories["functions"] + self.skill_categories["data_ops"]
+        all_skills = self._core_question_skills
         uncovered = [skill for skill in all_skills if coverage_vector.get(skill, 0) < 2]
         
         if uncovered:
@@ -227,7 +238,7 @@ Let's start with a brief introduction: Could you tell me about your experience w
             difficulty = min(3, coverage_vector.get(target_skill, 0) + 1)
         
         question = self._generate_skill_question(target_skill, difficulty)
-        coverage_vector[target_skill] = max(coverage_vector.get(target_skill, 0), difficulty)
+        self._update_skill_coverage(coverage_vector, target_skill, difficulty)
         
         return {
             "state": InterviewState.CORE_Q.value,
@@ -323,9 +334,7 @@ Let's start with a brief introduction: Could you tell me about your experience w
         repo = InterviewRepository(db)
         
         # Get the most recent turn
-        recent_turn = db.query(Turn).filter(
-            Turn.interview_id == interview_id
-        ).order_by(Turn.turn_number.desc()).first()
+        recent_turn = repo.get_latest_turn(interview_id)
         
         if recent_turn:
             # Grade using hybrid grader
@@ -336,9 +345,10 @@ Let's start with a brief introduction: Could you tell me about your experience w
                 difficulty=recent_turn.difficulty
             )
             
-            # Update turn with grading results
+            # Update turn with grading results; the caller commits the whole turn
             repo.update_turn(
                 recent_turn.id,
+                commit=False,
                 answer=answer,
                 rule_score=grading_result.get("rule_score"),
                 llm_score=grading_result.get("llm_score"),
@@ -351,19 +361,33 @@ Let's start with a brief introduction: Could you tell me about your experience w
     def _needs_deep_dive(self, coverage_vector: Dict[str, int]) -> bool:
         """Determine if candidate needs deep dive questions - MADE MORE SELECTIVE"""
         # Only deep dive if candidate is performing very well (at least 15 questions asked)
-        core_skills = self.skill_categories["foundations"] + self.skill_categories["functions"]
-        total_asked = sum(coverage_vector.get(skill, 0) for skill in core_skills)
-        avg_coverage = sum(coverage_vector.get(skill, 0) for skill in core_skills) / len(core_skills)
+        _, total_asked = self._core_coverage(coverage_vector)
+        avg_coverage = total_asked / len(self._core_skills)
         return avg_coverage >= 3.0 and total_asked >= 15
     
     def _core_coverage_sufficient(self, coverage_vector: Dict[str, int]) -> bool:
         """Check if core coverage is sufficient to move to case - MADE MORE STRICT"""
-        core_skills = self.skill_categories["foundations"] + self.skill_categories["functions"]
         # Require at least 8 questions instead of 70% coverage
-        covered_count = sum(1 for skill in core_skills if coverage_vector.get(skill, 0) >= 2)
-        total_asked = sum(coverage_vector.get(skill, 0) for skill in core_skills)
+        covered_count, total_asked = self._core_coverage(coverage_vector)
         return covered_count >= 8 and total_asked >= 12  # At least 12 questions asked in core skills
     
+    @staticmethod
+    def _update_skill_coverage(coverage_vector: Dict[str, int], skill: str, level: int):
+        """Raise a skill's coverage to level; coverage never goes down"""
+        if coverage_vector.get(skill, 0) < level:
+            coverage_vector[skill] = level
+    
+    def _core_coverage(self, coverage_vector: Dict[str, int]) -> Tuple[int, int]:
+        """Number of core skills covered at level 2+ and the summed core levels, in one pass"""
+        covered_count = 0
+        total_asked = 0
+        for skill in self._core_skills:
+            level = coverage_vector.get(skill, 0)
+            total_asked += level
+            if level >= 2:
+                covered_count += 1
+        return covered_count, total_asked
+    
     def _deep_dive_complete(self, coverage_vector: Dict[str, int]) -> bool:
         """Check if deep dive is complete"""
         analysis_skills = self.skill_categories["analysis"]
@@ -379,3 +403,13 @@ Let's start with a brief introduction: Could you tell me about your experience w
             "coverage_vector": {},
             "end_reason": reason
         }
+    
+    # Next step for an answer given in each state; states not listed end the interview
+    _STATE_HANDLERS = {
+        InterviewState.INTRO: _transition_to_calibrate,
+        InterviewState.CALIBRATE: _transition_to_core,
+        InterviewState.CORE_Q: _after_core_question,
+        InterviewState.DEEP_DIVE: _after_deep_dive,
+        InterviewState.CASE: _after_case,
+        InterviewState.REVIEW: _after_review
+    }
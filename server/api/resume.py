@@ -5,6 +5,7 @@ Resume upload and analysis endpoints.
 from fastapi import APIRouter, UploadFile, File, HTTPException
 from fastapi.responses import JSONResponse
 from typing import Dict, Any
+import asyncio
 import logging
 
 # Import with fallback for missing dependencies
@@ -47,7 +48,8 @@ async def upload_resume(file: UploadFile = File(...)) -> Dict[str, Any]:
     try:
         # Parse resume
         parser = ResumeParser()
-        analysis = parser.parse_resume(file_content, file.filename or "resume")
+        # Parsing is blocking (PyPDF2/docx); run it in a worker thread
+        analysis = await asyncio.to_thread(parser.parse_resume, file_content, file.filename or "resume")
         
         if 'error' in analysis:
             return JSONResponse(
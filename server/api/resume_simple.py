@@ -5,6 +5,7 @@ Simplified resume upload without multipart dependencies.
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Dict, Any
+import asyncio
 import base64
 import logging
 
@@ -20,6 +21,31 @@ class ResumeAnalysisResponse(BaseModel):
     analysis: Dict[str, Any]
     message: str
 
+def _extract_resume_text(file_content: bytes) -> str:
+    """Extract text from PDF properly, falling back to UTF-8 for other files."""
+    resume_text = ""
+    try:
+        import PyPDF2
+        import io
+        
+        # Create a PDF reader from the binary content
+        pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_content))
+        
+        # Extract text from all pages
+        resume_text = "".join(f"{page.extract_text() or ''}\n" for page in pdf_reader.pages)
+            
+        print(f"📄 Extracted PDF text length: {len(resume_text)}")
+        print(f"📄 First 200 characters: {repr(resume_text[:200])}")
+        
+    except Exception as pdf_error:
+        print(f"❌ PDF parsing failed: {pdf_error}")
+        # Fallback to UTF-8 decoding for non-PDF files
+        resume_text = file_content.decode('utf-8', errors='ignore')
+        print(f"📄 Fallback text length: {len(resume_text)}")
+        print(f"📄 First 200 characters: {repr(resume_text[:200])}")
+    
+    return resume_text
+
 @router.post("/upload-resume-simple", response_model=ResumeAnalysisResponse)
 async def upload_resume_simple(request: ResumeUploadRequest) -> ResumeAnalysisResponse:
     """Upload and analyze resume using base64 encoding (no multipart required)."""
@@ -28,29 +54,8 @@ async def upload_resume_simple(request: ResumeUploadRequest) -> ResumeAnalysisRe
         # Decode base64 content
         file_content = base64.b64decode(request.content)
         
-        # Extract text from PDF properly
-        resume_text = ""
-        try:
-            import PyPDF2
-            import io
-            
-            # Create a PDF reader from the binary content
-            pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_content))
-            
-            # Extract text from all pages
-            for page_num in range(len(pdf_reader.pages)):
-                page = pdf_reader.pages[page_num]
-                resume_text += page.extract_text() + "\n"
-                
-            print(f"📄 Extracted PDF text length: {len(resume_text)}")
-            print(f"📄 First 200 characters: {repr(resume_text[:200])}")
-            
-        except Exception as pdf_error:
-            print(f"❌ PDF parsing failed: {pdf_error}")
-            # Fallback to UTF-8 decoding for non-PDF files
-            resume_text = file_content.decode('utf-8', errors='ignore')
-            print(f"📄 Fallback text length: {len(resume_text)}")
-            print(f"📄 First 200 characters: {repr(resume_text[:200])}")
+        # Extract text off the event loop; PDF parsing is slow and blocking
+        resume_text = await asyncio.to_thread(_extract_resume_text, file_content)
         
         # Ensure we have meaningful content
         if len(resume_text.strip()) < 10:
@@ -9,7 +9,7 @@ from typing import Dict, Any, Optional, List
 from datetime import datetime
 import logging
 
-from services.timing_service import timing_service
+from services.timing_service import timing_service, format_timing_key, parse_timing_key
 
 router = APIRouter()
 
@@ -48,7 +48,7 @@ async def start_timing(request: StartTimingRequest) -> Dict[str, str]:
             request.question_id,
             request.question_text
         )
-        return {"timing_key": timing_key, "status": "started"}
+        return {"timing_key": format_timing_key(timing_key), "status": "started"}
     except Exception as e:
         logging.error(f"Error starting timing: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -58,7 +58,7 @@ async def record_keystroke(event: KeystrokeEvent) -> Dict[str, str]:
     """Record keystroke events for timing analysis."""
     try:
         timing_service.record_keystroke(
-            event.timing_key,
+            parse_timing_key(event.timing_key),
             event.keystroke_type,
             event.char,
             event.timestamp
@@ -73,7 +73,7 @@ async def record_paste(event: PasteEvent) -> Dict[str, str]:
     """Record paste events for authenticity analysis."""
     try:
         timing_service.record_paste_event(
-            event.timing_key,
+            parse_timing_key(event.timing_key),
             event.content_length,
             event.timestamp
         )
@@ -88,7 +88,7 @@ async def record_focus(event: FocusEvent) -> Dict[str, str]:
     """Record focus/blur events for tab switching detection."""
     try:
         timing_service.record_focus_event(
-            event.timing_key,
+            parse_timing_key(event.timing_key),
             event.event_type,
             event.timestamp
         )
@@ -102,7 +102,7 @@ async def finish_timing(request: FinishTimingRequest) -> Dict[str, Any]:
     """Complete timing analysis for a response."""
     try:
         completed_timing = timing_service.finish_response_timing(
-            request.timing_key,
+            parse_timing_key(request.timing_key),
             request.final_answer,
             request.timestamp
         )
@@ -133,6 +133,7 @@ async def get_timing_analytics(interview_id: int) -> Dict[str, Any]:
     # For now, return placeholder analytics
     return {
         "interview_id": interview_id,
+        "running_medians": timing_service.get_running_medians(interview_id),
         "message": "Timing analytics would show comprehensive analysis here",
         "features": [
             "Response time patterns",
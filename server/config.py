@@ -0,0 +1,32 @@
+"""
+Application settings, read from the environment and cached until cleared.
+"""
+
+import os
+from functools import lru_cache
+from types import SimpleNamespace
+
+# Load .env at import, as main.py used to, so it is in place before anything reads settings
+try:
+    from dotenv import load_dotenv
+    load_dotenv(dotenv_path="../.env")  # Load from parent directory
+except ImportError:
+    pass  # dotenv not available, assume env vars are set
+
+@lru_cache(maxsize=1)
+def settings() -> SimpleNamespace:
+    """Snapshot the settings we use; call settings.cache_clear() after changing the environment"""
+    return SimpleNamespace(
+        provider=os.environ.get("PROVIDER", "gemini").lower(),
+        model_name=os.environ.get("MODEL_NAME"),
+        gemini_api_key=os.environ.get("GEMINI_API_KEY"),
+        groq_api_key=os.environ.get("GROQ_API_KEY"),
+        anthropic_api_key=os.environ.get("ANTHROPIC_API_KEY"),
+        database_url=os.environ.get("DATABASE_URL", "sqlite:///./interviews.db"),
+        log_level=os.environ.get("LOG_LEVEL", "INFO").upper(),
+        prewarm=os.environ.get("PREWARM", "0") == "1",
+        # Requests per minute allowed per provider
+        gemini_rpm=int(os.environ.get("GEMINI_RPM", "15")),
+        groq_rpm=int(os.environ.get("GROQ_RPM", "30")),
+        claude_rpm=int(os.environ.get("CLAUDE_RPM", "50"))
+    )
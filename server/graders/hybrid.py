@@ -1,11 +1,38 @@
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Union
 from dataclasses import dataclass
-import statistics
 
-from graders.rule_based import RuleBasedGrader, RuleResult
+from graders.preprocessed import PreparedAnswer, prepare
+from graders.rule_based import RuleResult, rule_grader
 from graders.llm_based import LLMBasedGrader, LLMGradingResult
 
-@dataclass
+# Keywords that mark a question as needing multi-step or advanced reasoning
+COMPLEXITY_KEYWORDS = ("NESTED", "PIVOT", "INDEX/MATCH", "ARRAY", "SCENARIO",
+                       "DASHBOARD", "MACRO", "EDGE CASE", "OPTIMIZE")
+
+def analyze_complexity(question: str) -> Dict[str, Any]:
+    """Estimate question complexity (1-5) from keywords, function names and length"""
+    question_upper = question.upper()
+    keyword_hits = [kw for kw in COMPLEXITY_KEYWORDS if kw in question_upper]
+    function_hits = [func for func in rule_grader.FORMULA_FUNCTIONS if func in question_upper]
+    word_count = len(question.split())
+    
+    complexity = 1
+    complexity += min(2, len(keyword_hits))
+    complexity += min(1, len(function_hits) // 2)
+    if word_count > 80:
+        complexity += 1
+    complexity = min(5, complexity)
+    
+    reasons = []
+    if keyword_hits:
+        reasons.append(f"advanced topics: {', '.join(kw.lower() for kw in keyword_hits)}")
+    if function_hits:
+        reasons.append(f"{len(function_hits)} functions referenced")
+    reasons.append(f"{word_count} words")
+    
+    return {"complexity": complexity, "reasoning": "; ".join(reasons)}
+
+@dataclass(slots=True)
 class HybridGradingResult:
     rule_score: Optional[float]
     llm_score: Optional[float] 
@@ -22,13 +49,17 @@ class HybridGrader:
     """
     
     def __init__(self):
-        self.rule_grader = RuleBasedGrader()
+        self.rule_grader = rule_grader
         self.llm_grader = LLMBasedGrader()
         
         # Confidence thresholds for different grading strategies
         self.high_confidence_threshold = 0.8
         self.escalation_threshold = 0.5
         self.disagreement_threshold = 20  # Points difference
+        self.escalation_complexity = 4  # analyze_complexity rating that warrants the premium model
+        # Rule verdicts the LLM wouldn't overturn: a clean near-perfect pass, or nothing to grade
+        self.decisive_pass_threshold = 0.95
+        self.decisive_fail_threshold = 0.1
         
         # Skills that are primarily rule-based vs LLM-based
         self.rule_heavy_skills = [
@@ -38,36 +69,47 @@ class HybridGrader:
             "pivot_tables", "case_analysis", "charts", "best_practices"
         ]
     
-    async def grade_answer(self, question: str, answer: str, target_skill: str,
+    async def grade_answer(self, question: str, answer: Union[str, PreparedAnswer], target_skill: str,
                           difficulty: int, expected_answer: str = None) -> Dict[str, Any]:
         """Grade answer using hybrid approach with intelligent routing"""
+        # Case-folding and splitting happen once here and are shared by both graders
+        prep = prepare(answer)
         
         # Step 1: Always run rule-based grading for applicable skills
-        rule_result = None
-        if target_skill in self.rule_heavy_skills or self._contains_formulas(answer):
-            rule_result = self.rule_grader.grade_answer(
-                question, answer, target_skill, difficulty, expected_answer
-            )
+        rule_result = self._rule_grade(question, prep, target_skill, difficulty, expected_answer)
         
         # Step 2: Determine if LLM grading is needed
-        needs_llm = self._needs_llm_grading(rule_result, target_skill, difficulty, answer)
+        needs_llm = self._needs_llm_grading(rule_result, target_skill, difficulty, prep)
         
         llm_result = None
         if needs_llm:
             llm_result = await self.llm_grader.grade_answer(
-                question, answer, target_skill, difficulty, expected_answer,
-                rule_results=rule_result.__dict__ if rule_result else None
+                question, prep, target_skill, difficulty, expected_answer,
+                rule_results=rule_result.to_dict() if rule_result else None
             )
         
-        # Step 3: Combine results intelligently
+        # Steps 3 and 4: combine and escalate
+        return await self._finalize(question, prep, target_skill, difficulty, rule_result, llm_result)
+    
+    def _rule_grade(self, question: str, prep: PreparedAnswer, target_skill: str,
+                    difficulty: int, expected_answer: Optional[str]) -> Optional[RuleResult]:
+        """Rule-grade answers to rule-heavy skills and answers containing formulas"""
+        if target_skill in self.rule_heavy_skills or self._contains_formulas(prep):
+            return self.rule_grader.grade_answer(
+                question, prep, target_skill, difficulty, expected_answer
+            )
+        return None
+    
+    async def _finalize(self, question: str, prep: PreparedAnswer, target_skill: str, difficulty: int,
+                        rule_result: Optional[RuleResult],
+                        llm_result: Optional[LLMGradingResult]) -> Dict[str, Any]:
+        """Combine the rule and LLM results, escalating when the outcome is unclear"""
         hybrid_result = self._combine_results(rule_result, llm_result, target_skill, difficulty)
         
-        # Step 4: Check for escalation needs
-        if self._needs_escalation(hybrid_result, rule_result, llm_result):
-            escalated_result = await self._escalate_grading(
-                question, answer, target_skill, difficulty, rule_result, llm_result
+        if self._needs_escalation(hybrid_result, rule_result, llm_result, question):
+            return await self._escalate_grading(
+                question, prep, target_skill, difficulty, rule_result, llm_result
             )
-            return escalated_result
         
         return {
             "rule_score": rule_result.score * 100 if rule_result else None,
@@ -80,13 +122,17 @@ class HybridGrader:
         }
     
     def _needs_llm_grading(self, rule_result: Optional[RuleResult], target_skill: str,
-                          difficulty: int, answer: str) -> bool:
+                          difficulty: int, prep: PreparedAnswer) -> bool:
         """Determine if LLM grading is necessary"""
         
         # Always use LLM for LLM-heavy skills
         if target_skill in self.llm_heavy_skills:
             return True
         
+        # Skip the LLM when the rule verdict is decisive either way
+        if rule_result and self._rule_result_decisive(rule_result):
+            return False
+        
         # Use LLM for high difficulty questions
         if difficulty >= 3:
             return True
@@ -96,15 +142,22 @@ class HybridGrader:
             return True
         
         # Use LLM for complex answers (long explanations)
-        if len(answer.split()) > 50:
+        if prep.word_count > 50:
             return True
         
         # Use LLM if rule-based found errors but answer seems sophisticated
-        if rule_result and rule_result.error_tags and len(answer) > 100:
+        if rule_result and rule_result.error_tags and len(prep.raw) > 100:
             return True
         
         return False
     
+    def _rule_result_decisive(self, rule_result: RuleResult) -> bool:
+        """True for a clean near-perfect pass, or a fail because there was nothing to grade"""
+        if rule_result.passed and not rule_result.error_tags:
+            return rule_result.score >= self.decisive_pass_threshold
+        return (rule_result.score <= self.decisive_fail_threshold
+                and "answer_too_short" in rule_result.error_tags)
+    
     def _combine_results(self, rule_result: Optional[RuleResult],
                         llm_result: Optional[LLMGradingResult],
                         target_skill: str, difficulty: int) -> HybridGradingResult:
@@ -196,7 +249,7 @@ class HybridGrader:
     
     def _needs_escalation(self, hybrid_result: HybridGradingResult,
                          rule_result: Optional[RuleResult],
-                         llm_result: Optional[LLMGradingResult]) -> bool:
+                         llm_result: Optional[LLMGradingResult], question: str) -> bool:
         """Determine if grading needs escalation to premium model"""
         
         # Escalate if confidence is very low
@@ -211,9 +264,14 @@ class HybridGrader:
         if hybrid_result.grading_method == "fallback":
             return True
         
+        # Escalate complex questions unless the grade is already confident
+        if (hybrid_result.confidence < self.high_confidence_threshold
+                and analyze_complexity(question)["complexity"] >= self.escalation_complexity):
+            return True
+        
         return False
     
-    async def _escalate_grading(self, question: str, answer: str, target_skill: str,
+    async def _escalate_grading(self, question: str, answer: Union[str, PreparedAnswer], target_skill: str,
                                difficulty: int, rule_result: Optional[RuleResult],
                                llm_result: Optional[LLMGradingResult]) -> Dict[str, Any]:
         """Escalate to premium model (Claude) for complex cases"""
@@ -231,7 +289,7 @@ class HybridGrader:
                     # Re-grade with Claude
                     claude_result = await self.llm_grader.grade_answer(
                         question, answer, target_skill, difficulty,
-                        rule_results=rule_result.__dict__ if rule_result else None
+                        rule_results=rule_result.to_dict() if rule_result else None
                     )
                     
                     return {
@@ -274,25 +332,47 @@ class HybridGrader:
             "grading_method": "escalation_failed"
         }
     
-    def _contains_formulas(self, answer: str) -> bool:
+    def _contains_formulas(self, answer: Union[str, PreparedAnswer]) -> bool:
         """Check if answer contains Excel formulas"""
+        answer_upper = prepare(answer).upper
         formula_indicators = ["=", "SUM(", "VLOOKUP(", "IF(", "COUNTIF(", "INDEX(", "MATCH("]
-        return any(indicator in answer.upper() for indicator in formula_indicators)
+        return any(indicator in answer_upper for indicator in formula_indicators)
     
     async def grade_multiple_turns(self, turns_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Grade multiple interview turns efficiently"""
-        results = []
+        """Grade multiple interview turns, packing every LLM-graded answer into shared requests"""
+        preps = [prepare(turn_data["answer"]) for turn_data in turns_data]
+        rule_results = [
+            self._rule_grade(turn_data["question"], prep, turn_data["target_skill"],
+                             turn_data["difficulty"], turn_data.get("expected_answer"))
+            for turn_data, prep in zip(turns_data, preps)
+        ]
         
-        for turn_data in turns_data:
-            result = await self.grade_answer(
-                question=turn_data["question"],
-                answer=turn_data["answer"],
-                target_skill=turn_data["target_skill"],
-                difficulty=turn_data["difficulty"],
-                expected_answer=turn_data.get("expected_answer")
-            )
-            results.append(result)
+        llm_indices = [
+            index for index, (turn_data, prep, rule_result) in enumerate(zip(turns_data, preps, rule_results))
+            if self._needs_llm_grading(rule_result, turn_data["target_skill"], turn_data["difficulty"], prep)
+        ]
+        llm_results: List[Optional[LLMGradingResult]] = [None] * len(turns_data)
+        if llm_indices:
+            packed = await self.llm_grader.grade_batch_packed([
+                {
+                    "question": turns_data[index]["question"],
+                    "answer": preps[index].raw,
+                    "target_skill": turns_data[index]["target_skill"],
+                    "difficulty": turns_data[index]["difficulty"],
+                    "expected_answer": turns_data[index].get("expected_answer"),
+                    "rule_results": rule_results[index].to_dict() if rule_results[index] else None
+                }
+                for index in llm_indices
+            ])
+            for index, result in zip(llm_indices, packed):
+                llm_results[index] = result
         
+        results = []
+        for turn_data, prep, rule_result, llm_result in zip(turns_data, preps, rule_results, llm_results):
+            results.append(await self._finalize(
+                turn_data["question"], prep, turn_data["target_skill"], turn_data["difficulty"],
+                rule_result, llm_result
+            ))
         return results
     
     def calculate_overall_confidence(self, turn_results: List[Dict[str, Any]]) -> float:
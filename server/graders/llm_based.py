@@ -1,11 +1,20 @@
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Union
 import json
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 import asyncio
+import hashlib
 
-from llm.provider_abstraction import provider_manager
+from graders.preprocessed import PreparedAnswer, prepare
+from llm.provider_abstraction import LLMResponseCache, provider_manager
 
-@dataclass 
+# orjson is optional; fall back to the stdlib parser when it isn't installed
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+@dataclass(slots=True)
 class LLMGradingResult:
     scores_by_dimension: Dict[str, float]
     total_score: float  # 0-100
@@ -13,12 +22,64 @@ class LLMGradingResult:
     confidence: float  # 0-1
     feedback_short: str
 
+# Parsed LLM grades keyed by what was graded, so a repeated answer skips the request entirely
+_grading_cache = LLMResponseCache(max_size=1024, ttl_seconds=3600)
+
+def _load_response_json(response: str) -> Any:
+    """Decode a JSON-mode response.
+    
+    Providers without a native JSON mode sometimes wrap the object in prose or a
+    code fence; if the whole text doesn't decode, the outermost {...} span is tried.
+    """
+    try:
+        return _json_loads(response)
+    except ValueError:
+        start = response.find("{")
+        end = response.rfind("}")
+        if start < 0 or end < start:
+            raise
+        return _json_loads(response[start:end + 1])
+
 class LLMBasedGrader:
     """
     LLM-based grader that uses AI models to evaluate Excel answers
     with nuanced understanding and contextual scoring.
     """
     
+    GRADING_INSTRUCTIONS = """
+
+GRADING INSTRUCTIONS:
+- Score each dimension 0-100 based on quality and correctness
+- Consider the difficulty level (higher difficulty = more stringent grading)
+- Identify specific error types and areas for improvement
+- Be fair but thorough - Excel interviews require precision
+- Consider both technical correctness and practical understanding
+
+Respond with JSON in this exact format:
+{
+    "scores_by_dimension": {
+        "technical_accuracy": 85,
+        "completeness": 75,
+        "clarity": 90,
+        "efficiency": 80,
+        "best_practices": 70
+    },
+    "total_score": 80,
+    "error_tags": ["minor_syntax_error", "missing_error_handling"],
+    "confidence": 0.85,
+    "feedback_short": "Good understanding of VLOOKUP basics. Consider using IFERROR for better error handling. Syntax is correct but could explain approximate vs exact match better."
+}"""
+    
+    GRADING_PREAMBLE = "You are an expert Excel interviewer evaluating a candidate's response. Please grade this answer comprehensively.\n\n"
+    
+    PACKED_GRADING_PREAMBLE = "You are an expert Excel interviewer evaluating several candidate responses. Grade each answer independently.\n"
+    
+    PACKED_GRADING_FORMAT = """
+
+There are {count} answers above. Respond with a single JSON object of the form
+{{"results": [...]}} holding one grading object in the format above per answer,
+in the same order as the answers."""
+    
     def __init__(self):
         self.grading_dimensions = [
             "technical_accuracy",
@@ -48,15 +109,25 @@ class LLMBasedGrader:
                 "efficiency": "Efficient data organization approach"
             }
         }
+        
+        # Rendered prompt headers keyed by (skill, difficulty)
+        self._prompt_templates: Dict[tuple, str] = {}
     
-    async def grade_answer(self, question: str, answer: str, target_skill: str,
+    async def grade_answer(self, question: str, answer: Union[str, PreparedAnswer], target_skill: str,
                           difficulty: int, expected_answer: str = None,
                           rule_results: Dict = None) -> LLMGradingResult:
         """Grade answer using LLM with structured evaluation"""
+        prep = prepare(answer)
+        
+        cache_key = self._cache_key(question, prep.normalized, target_skill, difficulty,
+                                    expected_answer, rule_results)
+        cached = _grading_cache.get(cache_key)
+        if cached is not None:
+            return self._copy_result(cached)
         
         # Build comprehensive grading prompt
         prompt = self._build_grading_prompt(
-            question, answer, target_skill, difficulty, expected_answer, rule_results
+            question, prep.raw, target_skill, difficulty, expected_answer, rule_results
         )
         
         try:
@@ -64,75 +135,166 @@ class LLMBasedGrader:
             response = await provider_manager.grade_answer(prompt, temperature=0.1)
             
             # Parse structured response
-            grading_result = json.loads(response)
-            
-            return LLMGradingResult(
-                scores_by_dimension=grading_result.get("scores_by_dimension", {}),
-                total_score=grading_result.get("total_score", 0),
-                error_tags=grading_result.get("error_tags", []),
-                confidence=grading_result.get("confidence", 0.5),
-                feedback_short=grading_result.get("feedback_short", "")
-            )
+            result = self._parse_grading_result(_load_response_json(response))
+            # Fallback grades below are never cached, so a failed request is retried next time
+            _grading_cache.set(cache_key, self._copy_result(result))
+            return result
             
         except Exception as e:
             # Fallback scoring
-            return self._fallback_grading(answer, target_skill, str(e))
+            return self._fallback_grading(prep, target_skill, str(e))
+    
+    @staticmethod
+    def _cache_key(question: str, normalized_answer: str, target_skill: str, difficulty: int,
+                   expected_answer: Optional[str], rule_results: Optional[Dict]) -> bytes:
+        """Hash of everything that affects a grade; takes PreparedAnswer.normalized, so
+        answers differing only in case or whitespace share a key"""
+        raw = json.dumps(
+            [question, normalized_answer, target_skill, difficulty, expected_answer, rule_results],
+            sort_keys=True, default=str
+        )
+        return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).digest()
+    
+    @staticmethod
+    def _copy_result(result: LLMGradingResult) -> LLMGradingResult:
+        """Copy with its own containers, so callers can't alter a cached grade"""
+        return replace(result, scores_by_dimension=dict(result.scores_by_dimension),
+                       error_tags=list(result.error_tags))
+    
+    def clear_cache(self):
+        """Forget every cached grade"""
+        _grading_cache.clear()
     
     def _build_grading_prompt(self, question: str, answer: str, target_skill: str,
                             difficulty: int, expected_answer: str = None,
                             rule_results: Dict = None) -> str:
         """Build comprehensive grading prompt"""
+        return self.GRADING_PREAMBLE + self._grading_prompt_body(
+            question, answer, target_skill, difficulty, expected_answer, rule_results
+        ) + self.GRADING_INSTRUCTIONS
+    
+    def _grading_prompt_body(self, question: str, answer: str, target_skill: str,
+                             difficulty: int, expected_answer: str = None,
+                             rule_results: Dict = None) -> str:
+        """The per-answer part of a grading prompt: question, answer, rubric and hints"""
+        body = self._grading_prompt_template(target_skill, difficulty).format(
+            question=question, answer=answer
+        )
         
-        rubric = self.skill_rubrics.get(target_skill, {
-            "technical_accuracy": "Correctness of Excel knowledge",
-            "completeness": "Addresses all parts of question",
-            "clarity": "Clear explanation and reasoning"
-        })
+        if expected_answer:
+            body += f"\n\nEXPECTED APPROACH: {expected_answer}"
         
-        prompt = f"""You are an expert Excel interviewer evaluating a candidate's response. Please grade this answer comprehensively.
-
-QUESTION: {question}
+        if rule_results:
+            body += f"\n\nRULE-BASED ANALYSIS: {json.dumps(rule_results, indent=2)}"
+        
+        return body
+    
+    def _grading_prompt_template(self, target_skill: str, difficulty: int) -> str:
+        """Prompt body for a skill/difficulty with the rubric already rendered.
+        
+        Only the question and answer are filled in per call.
+        """
+        key = (target_skill, difficulty)
+        template = self._prompt_templates.get(key)
+        if template is None:
+            rubric = self.skill_rubrics.get(target_skill, {
+                "technical_accuracy": "Correctness of Excel knowledge",
+                "completeness": "Addresses all parts of question",
+                "clarity": "Clear explanation and reasoning"
+            })
+            
+            def escape(text: str) -> str:
+                # Literal braces must survive str.format
+                return str(text).replace("{", "{{").replace("}", "}}")
+            
+            template = f"""QUESTION: {{question}}
 
-CANDIDATE ANSWER: {answer}
+CANDIDATE ANSWER: {{answer}}
 
-TARGET SKILL: {target_skill}
-DIFFICULTY LEVEL: {difficulty}/3
+TARGET SKILL: {escape(target_skill)}
+DIFFICULTY LEVEL: {escape(difficulty)}/3
 
 GRADING RUBRIC:
-{json.dumps(rubric, indent=2)}
+{escape(json.dumps(rubric, indent=2))}
 """
+            self._prompt_templates[key] = template
+        return template
+    
+    def _parse_grading_result(self, grading_result: Dict[str, Any]) -> LLMGradingResult:
+        """Build a result from one decoded grading JSON object"""
+        return LLMGradingResult(
+            scores_by_dimension=grading_result.get("scores_by_dimension", {}),
+            total_score=grading_result.get("total_score", 0),
+            error_tags=grading_result.get("error_tags", []),
+            confidence=grading_result.get("confidence", 0.5),
+            feedback_short=grading_result.get("feedback_short", "")
+        )
+    
+    async def grade_batch_packed(self, answers: List[Dict[str, Any]],
+                                 max_per_request: int = 8) -> List[LLMGradingResult]:
+        """Grade several answers with one LLM request per max_per_request answers.
         
-        if expected_answer:
-            prompt += f"\n\nEXPECTED APPROACH: {expected_answer}"
+        The answers share a single copy of the grading instructions. Cached grades are
+        reused; a chunk whose response can't be matched back to its answers is regraded
+        with grade_batch.
+        """
+        results: List[Optional[LLMGradingResult]] = [None] * len(answers)
+        pending = []
+        for index, answer_data in enumerate(answers):
+            cached = _grading_cache.get(self._answer_cache_key(answer_data))
+            if cached is not None:
+                results[index] = self._copy_result(cached)
+            else:
+                pending.append(index)
         
-        if rule_results:
-            prompt += f"\n\nRULE-BASED ANALYSIS: {json.dumps(rule_results, indent=2)}"
+        chunks = [pending[i:i + max_per_request] for i in range(0, len(pending), max_per_request)]
+        graded = await asyncio.gather(*(
+            self._grade_packed_chunk([answers[index] for index in chunk]) for chunk in chunks
+        ))
+        for chunk, chunk_results in zip(chunks, graded):
+            for index, result in zip(chunk, chunk_results):
+                results[index] = result
+        return results
+    
+    def _answer_cache_key(self, answer_data: Dict[str, Any]) -> bytes:
+        return self._cache_key(
+            answer_data["question"], prepare(answer_data["answer"]).normalized,
+            answer_data["target_skill"], answer_data["difficulty"],
+            answer_data.get("expected_answer"), answer_data.get("rule_results")
+        )
+    
+    async def _grade_packed_chunk(self, answers: List[Dict[str, Any]]) -> List[LLMGradingResult]:
+        if len(answers) == 1:
+            return await self.grade_batch(answers)
         
-        prompt += """
-
-GRADING INSTRUCTIONS:
-- Score each dimension 0-100 based on quality and correctness
-- Consider the difficulty level (higher difficulty = more stringent grading)
-- Identify specific error types and areas for improvement
-- Be fair but thorough - Excel interviews require precision
-- Consider both technical correctness and practical understanding
-
-Respond with JSON in this exact format:
-{
-    "scores_by_dimension": {
-        "technical_accuracy": 85,
-        "completeness": 75,
-        "clarity": 90,
-        "efficiency": 80,
-        "best_practices": 70
-    },
-    "total_score": 80,
-    "error_tags": ["minor_syntax_error", "missing_error_handling"],
-    "confidence": 0.85,
-    "feedback_short": "Good understanding of VLOOKUP basics. Consider using IFERROR for better error handling. Syntax is correct but could explain approximate vs exact match better."
-}"""
+        sections = [self.PACKED_GRADING_PREAMBLE]
+        for number, answer_data in enumerate(answers, start=1):
+            sections.append(f"\n===== ANSWER [{number}] =====\n")
+            sections.append(self._grading_prompt_body(
+                answer_data["question"], answer_data["answer"], answer_data["target_skill"],
+                answer_data["difficulty"], answer_data.get("expected_answer"),
+                answer_data.get("rule_results")
+            ))
+        sections.append(self.GRADING_INSTRUCTIONS)
+        sections.append(self.PACKED_GRADING_FORMAT.format(count=len(answers)))
+        
+        try:
+            response = await provider_manager.grade_answer(
+                "".join(sections), temperature=0.1, max_tokens=300 * len(answers)
+            )
+            results = _load_response_json(response)["results"]
+            if not isinstance(results, list):
+                raise ValueError(f"expected a list of results, got {type(results).__name__}")
+            if len(results) != len(answers):
+                raise ValueError(f"expected {len(answers)} results, got {len(results)}")
+            parsed = [self._parse_grading_result(result) for result in results]
+        except Exception:
+            # Fall back to one request per answer
+            return await self.grade_batch(answers)
         
-        return prompt
+        for answer_data, result in zip(answers, parsed):
+            _grading_cache.set(self._answer_cache_key(answer_data), self._copy_result(result))
+        return parsed
     
     async def grade_batch(self, answers: List[Dict[str, Any]]) -> List[LLMGradingResult]:
         """Grade multiple answers in batch for efficiency"""
@@ -188,18 +350,20 @@ Respond with JSON in this exact format:
             "calibration_quality": "good" if accuracy >= 0.8 else "needs_adjustment"
         }
     
-    def _fallback_grading(self, answer: str, target_skill: str, error: str) -> LLMGradingResult:
+    def _fallback_grading(self, answer: Union[str, PreparedAnswer], target_skill: str,
+                          error: str) -> LLMGradingResult:
         """Provide fallback grading when LLM fails"""
+        prep = prepare(answer)
         base_score = 60  # Conservative baseline
         
         # Simple heuristics
-        if len(answer.strip()) < 20:
+        if len(prep.raw.strip()) < 20:
             base_score -= 20
         
-        if "=" in answer:  # Has formula
+        if "=" in prep.raw:  # Has formula
             base_score += 10
         
-        if len(answer.split()) > 50:  # Detailed answer
+        if prep.word_count > 50:  # Detailed answer
             base_score += 10
         
         return LLMGradingResult(
@@ -0,0 +1,28 @@
+"""
+Answer preprocessing shared by the rule-based and LLM graders
+"""
+from dataclasses import dataclass
+from typing import List, Union
+
+@dataclass(slots=True)
+class PreparedAnswer:
+    """An answer together with the case-folded and split forms the graders read"""
+    raw: str
+    lower: str
+    upper: str
+    words: List[str]  # Whitespace-separated tokens of the raw answer
+    
+    @property
+    def word_count(self) -> int:
+        return len(self.words)
+    
+    @property
+    def normalized(self) -> str:
+        """Lower-cased with whitespace runs collapsed, for comparing answers"""
+        return " ".join(self.words).lower()
+
+def prepare(answer: Union[str, PreparedAnswer]) -> PreparedAnswer:
+    """Preprocess an answer once; an already prepared answer is returned unchanged"""
+    if isinstance(answer, PreparedAnswer):
+        return answer
+    return PreparedAnswer(raw=answer, lower=answer.lower(), upper=answer.upper(), words=answer.split())
@@ -1,13 +1,42 @@
 import re
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Dict, Any, List, Optional, Tuple, Union
 from dataclasses import dataclass
+from functools import lru_cache
 
-@dataclass
+from graders.preprocessed import PreparedAnswer, prepare
+
+@dataclass(slots=True, init=False)
 class RuleResult:
     passed: bool
     score: float  # 0.0 to 1.0
     error_tags: List[str]
-    feedback: str
+    feedback_parts: List[str]
+    
+    def __init__(self, passed: bool, score: float, error_tags: List[str],
+                 feedback: Optional[str] = None, *, feedback_parts: Optional[List[str]] = None):
+        """Take feedback as one string, as before, or as feedback_parts joined on read"""
+        if feedback is not None and feedback_parts is not None:
+            raise TypeError("RuleResult takes feedback or feedback_parts, not both")
+        self.passed = passed
+        self.score = score
+        self.error_tags = error_tags
+        if feedback_parts is None:
+            feedback_parts = [] if feedback is None else [feedback]
+        self.feedback_parts = feedback_parts
+    
+    @property
+    def feedback(self) -> str:
+        """Feedback text, joined only when a caller actually reads it"""
+        return "; ".join(self.feedback_parts)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize with the joined feedback string"""
+        return {
+            "passed": self.passed,
+            "score": self.score,
+            "error_tags": self.error_tags,
+            "feedback": self.feedback
+        }
 
 class RuleBasedGrader:
     """
@@ -15,56 +44,197 @@ class RuleBasedGrader:
     Validates specific patterns, syntax, and common errors.
     """
     
+    # Patterns are written to match in linear time on adversarial input: no
+    # leading "=?\s*" (which rescans every whitespace run), no greedy ".*"
+    # tails, and cell references only start at the beginning of a letter run.
+    _SUM_RE = re.compile(r"SUM\s*\([^)]+\)", re.IGNORECASE)
+    _VLOOKUP_RE = re.compile(r"VLOOKUP\s*\(([^()]*(?:\([^()]*\)[^()]*)*)\)", re.IGNORECASE)
+    _IF_RE = re.compile(r"IF\s*\(([^()]*(?:\([^()]*\)[^()]*)*)\)", re.IGNORECASE)
+    _COUNTIF_RE = re.compile(r"COUNTIF\s*\([^,]+,[^)]+\)", re.IGNORECASE)
+    _INDEX_MATCH_RE = re.compile(r"INDEX\s*\([^,]+,\s*MATCH\s*\([^)]+\)\s*\)", re.IGNORECASE)
+    _ABSOLUTE_REF_RE = re.compile(r"\$[A-Z]+\$[0-9]+")
+    _RELATIVE_REF_RE = re.compile(r"(?<![A-Z])[A-Z]+[0-9]+")
+    _RANGE_RE = re.compile(r"(?<![A-Z])[A-Z]+[0-9]+:[A-Z]+[0-9]+")
+    
+    # Name lookup for callers that iterate over the patterns; the graders
+    # use the attributes above directly
+    FORMULA_PATTERNS = {
+        "sum": _SUM_RE,
+        "vlookup": _VLOOKUP_RE,
+        "if": _IF_RE,
+        "countif": _COUNTIF_RE,
+        "index_match": _INDEX_MATCH_RE,
+        "absolute_ref": _ABSOLUTE_REF_RE,
+        "relative_ref": _RELATIVE_REF_RE,
+        "range": _RANGE_RE
+    }
+    
+    COMMON_ERRORS = {
+        "circular_reference": re.compile(r"(?i)circular"),
+        "div_zero": re.compile(r"#DIV/0!"),
+        "name_error": re.compile(r"#NAME\?"),
+        "ref_error": re.compile(r"#REF!"),
+        "value_error": re.compile(r"#VALUE!"),
+        "na_error": re.compile(r"#N/A")
+    }
+    
+    # Single-pass scan for cell references. Branch order matters: a range
+    # is reported instead of its leading relative reference, and absolute
+    # references never overlap the other two.
+    _CELL_REFERENCE_SCAN_RE = re.compile(
+        r"(?P<absolute>\$[A-Z]+\$[0-9])"
+        r"|(?P<range>[A-Z][0-9]+:[A-Z]+[0-9])"
+        r"|(?P<relative>[A-Z][0-9]+)"
+    )
+    
+    # Whole-word keyword sets for the pivot table grader, matched against the
+    # answer's tokens; common inflections are listed explicitly
+    _WORD_RE = re.compile(r"[a-z]+")
+    _PIVOT_KEYWORDS = frozenset({
+        "pivot", "pivots", "pivottable", "pivottables", "summarize", "summarise",
+        "summarizes", "summarized", "group", "groups", "grouped", "grouping",
+        "aggregate", "aggregated", "aggregates", "aggregation"
+    })
+    _PIVOT_COMPONENTS = frozenset({"rows", "columns", "values", "filters", "fields"})
+    _STEP_INDICATORS = frozenset({
+        "first", "then", "next", "step", "steps", "insert", "inserting",
+        "create", "creating", "drag", "dragging", "drop", "dropping"
+    })
+    
+    # Functions that signal a worked analysis rather than a basic formula. Checked
+    # with one substring test per name: for a handful of literals that is several
+    # times faster than a combined alternation regex and finditer
+    FORMULA_FUNCTIONS = ("AVERAGEIF", "COUNTIF", "INDEX", "MATCH", "VLOOKUP", "DATEDIF", "TODAY")
+    
+    _REFERENCE_MOVE_RE = re.compile(r"reference.*change|move")
+    _IF_CALL_RE = re.compile(r"IF\s*\(", re.IGNORECASE)
+    _NUMBERED_ITEM_RE = re.compile(r"\d+\.")
+    
+    # Functions validate_formula recognises: rule name and minimum argument count
+    _FORMULA_RULES = {
+        "VLOOKUP": ("uses_vlookup", 3),
+        "IF": ("uses_if", 2),
+        "SUMIF": ("uses_sumif", 2),
+        "COUNTIF": ("uses_countif", 2),
+        "INDEX": ("uses_index", 2),
+        "MATCH": ("uses_match", 2),
+        "SUM": ("uses_sum", 1)
+    }
+    # Every recognised call in one scan; the lookbehind keeps IF from matching SUMIF
+    _FUNCTION_CALL_RE = re.compile(
+        r"(?<![A-Z])(%s)\s*\(" % "|".join(sorted(_FORMULA_RULES, key=len, reverse=True)),
+        re.IGNORECASE
+    )
+    # Function a formula must call to be valid for a skill
+    _SKILL_FUNCTIONS = {
+        "vlookup": "VLOOKUP",
+        "if_functions": "IF",
+        "sumif": "SUMIF",
+        "countif": "COUNTIF",
+        "index_match": "INDEX",
+        "basic_formulas": "SUM"
+    }
+    # Default weight of each rule when a validation result carries no rule_scores
+    RULE_SCORES = {
+        **{rule: 40 for rule, _ in _FORMULA_RULES.values()},
+        "correct_syntax": 30,
+        "exact_match": 20
+    }
+    
     def __init__(self):
-        self.formula_patterns = {
-            "sum": r"=?\s*SUM\s*\([^)]+\)",
-            "vlookup": r"=?\s*VLOOKUP\s*\([^,]+,[^,]+,[^,]+,.*\)",
-            "if": r"=?\s*IF\s*\([^,]+,[^,]+.*\)",
-            "countif": r"=?\s*COUNTIF\s*\([^,]+,[^)]+\)",
-            "index_match": r"=?\s*INDEX\s*\([^,]+,\s*MATCH\s*\([^)]+\)\s*\)",
-            "absolute_ref": r"\$[A-Z]+\$[0-9]+",
-            "relative_ref": r"[A-Z]+[0-9]+",
-            "range": r"[A-Z]+[0-9]+:[A-Z]+[0-9]+"
-        }
-        
-        self.common_errors = {
-            "circular_reference": r"(?i)circular",
-            "div_zero": r"#DIV/0!",
-            "name_error": r"#NAME\?",
-            "ref_error": r"#REF!",
-            "value_error": r"#VALUE!",
-            "na_error": r"#N/A"
+        # Skill-specific graders; anything else falls back to _grade_generic
+        self._skill_graders = {
+            "references": self._grade_references,
+            "vlookup": self._grade_vlookup,
+            "if_functions": self._grade_if_functions,
+            "basic_formulas": self._grade_basic_formulas,
+            "pivot_tables": self._grade_pivot_tables,
+            "case_analysis": self._grade_case_analysis
         }
     
-    def grade_answer(self, question: str, answer: str, target_skill: str, 
+    def grade_answer(self, question: str, answer: Union[str, PreparedAnswer], target_skill: str, 
                     difficulty: int, expected_answer: str = None) -> RuleResult:
         """Grade an answer using rule-based validation"""
+        prep = prepare(answer)
+        
+        # Nothing worth scanning - skip every pattern search
+        if len(prep.raw.strip()) < 3:
+            return RuleResult(
+                passed=False,
+                score=0.0,
+                error_tags=["answer_too_short"],
+                feedback_parts=["Answer too short to grade"]
+            )
+        
+        skill_grader = self._skill_graders.get(target_skill)
+        if skill_grader is None:
+            return self._grade_generic(question, prep, target_skill, difficulty)
+        return skill_grader(question, prep, difficulty)
+    
+    def validate_formula(self, formula: str, skill: str) -> Dict[str, Any]:
+        """Check a single formula against the rules for a skill.
+        
+        Returns is_valid, the names of the matched rules and the score of each one.
+        """
+        is_valid, matched_rules = self._check_formula(formula or "", skill)
+        return {
+            "is_valid": is_valid,
+            "matched_rules": list(matched_rules),
+            "rule_scores": {rule: self.RULE_SCORES[rule] for rule in matched_rules}
+        }
+    
+    def calculate_score(self, validation_result: Dict[str, Any]) -> float:
+        """Score a validate_formula result out of 100 from its matched rules"""
+        rule_scores = validation_result.get("rule_scores") or {}
+        score = sum(
+            rule_scores.get(rule, self.RULE_SCORES.get(rule, 0))
+            for rule in validation_result.get("matched_rules", [])
+        )
+        return float(min(score, 100))
+    
+    @staticmethod
+    @lru_cache(maxsize=512)
+    def _check_formula(formula: str, skill: str) -> Tuple[bool, Tuple[str, ...]]:
+        """(is_valid, matched rules) for a formula; the same answers recur, so results are cached"""
+        grader = RuleBasedGrader
+        text = formula.strip()
+        # Arguments of the first call to each function
+        arguments = {}
+        for call in grader._FUNCTION_CALL_RE.finditer(text):
+            name = call.group(1).upper()
+            if name not in arguments:
+                arguments[name] = _call_arguments(text, call.end() - 1)
+        matched_rules = [rule for name, (rule, _) in grader._FORMULA_RULES.items() if name in arguments]
+        
+        syntax_ok = (
+            text.startswith("=")
+            and _parens_balanced(text)
+            and all(len(args) >= grader._FORMULA_RULES[name][1] for name, args in arguments.items())
+        )
+        if arguments and syntax_ok:
+            matched_rules.append("correct_syntax")
         
-        if target_skill == "references":
-            return self._grade_references(question, answer, difficulty)
-        elif target_skill == "vlookup":
-            return self._grade_vlookup(question, answer, difficulty)
-        elif target_skill == "if_functions":
-            return self._grade_if_functions(question, answer, difficulty)
-        elif target_skill == "basic_formulas":
-            return self._grade_basic_formulas(question, answer, difficulty)
-        elif target_skill == "pivot_tables":
-            return self._grade_pivot_tables(question, answer, difficulty)
-        elif target_skill == "case_analysis":
-            return self._grade_case_analysis(question, answer, difficulty)
-        else:
-            return self._grade_generic(question, answer, target_skill, difficulty)
+        vlookup_args = arguments.get("VLOOKUP")
+        if vlookup_args and len(vlookup_args) >= 4 and vlookup_args[3].upper() in ("FALSE", "0"):
+            matched_rules.append("exact_match")
+        
+        required = grader._SKILL_FUNCTIONS.get(skill)
+        uses_required = required in arguments if required else bool(arguments)
+        return syntax_ok and uses_required, tuple(matched_rules)
     
-    def _grade_references(self, question: str, answer: str, difficulty: int) -> RuleResult:
+    def _grade_references(self, question: str, prep: PreparedAnswer, difficulty: int) -> RuleResult:
         """Grade questions about cell references"""
-        answer_lower = answer.lower()
+        answer_lower = prep.lower
+        question_lower = question.lower()
+        word_count = prep.word_count
+        references = self._scan_cell_references(prep.raw)
         error_tags = []
         score = 0.0
         feedback_parts = []
         
         # Check for understanding of absolute vs relative references
-        if "absolute" in question.lower() or "$" in question:
-            if re.search(self.formula_patterns["absolute_ref"], answer):
+        if "absolute" in question_lower or "$" in question:
+            if references["absolute"]:
                 score += 0.5
                 feedback_parts.append("Correctly identified absolute reference syntax")
             else:
@@ -72,20 +242,20 @@ class RuleBasedGrader:
                 feedback_parts.append("Missing absolute reference syntax ($A$1)")
         
         # Check for relative reference understanding  
-        if "relative" in question.lower() or re.search(r"reference.*change|move", question.lower()):
-            if re.search(self.formula_patterns["relative_ref"], answer):
+        if "relative" in question_lower or self._REFERENCE_MOVE_RE.search(question_lower):
+            if references["relative"] or references["range"]:
                 score += 0.3
                 feedback_parts.append("Showed understanding of relative references")
             else:
                 error_tags.append("missing_relative_concept")
         
         # Check for range syntax
-        if re.search(self.formula_patterns["range"], answer):
+        if references["range"]:
             score += 0.2
             feedback_parts.append("Used proper range syntax")
         
         # Bonus points for explanation
-        if len(answer.split()) > 10 and any(word in answer_lower for word in ["because", "when", "will", "changes"]):
+        if word_count > 10 and any(word in answer_lower for word in ["because", "when", "will", "changes"]):
             score += 0.2
             feedback_parts.append("Provided good explanation of concepts")
         
@@ -93,17 +263,21 @@ class RuleBasedGrader:
             passed=score >= 0.6,
             score=min(score, 1.0),
             error_tags=error_tags,
-            feedback="; ".join(feedback_parts)
+            feedback_parts=feedback_parts
         )
     
-    def _grade_vlookup(self, question: str, answer: str, difficulty: int) -> RuleResult:
+    def _grade_vlookup(self, question: str, prep: PreparedAnswer, difficulty: int) -> RuleResult:
         """Grade VLOOKUP related answers"""
+        answer = prep.raw
+        answer_lower = prep.lower
         error_tags = []
         score = 0.0
         feedback_parts = []
         
         # Check for VLOOKUP syntax
-        vlookup_match = re.search(self.formula_patterns["vlookup"], answer, re.IGNORECASE)
+        vlookup_match = None
+        if "vlookup" in answer_lower:
+            vlookup_match = self._VLOOKUP_RE.search(answer)
         if vlookup_match:
             score += 0.4
             feedback_parts.append("Used VLOOKUP function")
@@ -117,7 +291,7 @@ class RuleBasedGrader:
                 feedback_parts.append("Included required parameters")
                 
                 # Check for proper table array (range or reference)
-                if re.search(self.formula_patterns["range"], params[1]) or ":" in params[1]:
+                if self._RANGE_RE.search(params[1]) or ":" in params[1]:
                     score += 0.1
                 else:
                     error_tags.append("invalid_table_array")
@@ -139,7 +313,7 @@ class RuleBasedGrader:
         
         else:
             # Check if they mentioned alternative approaches
-            if any(alt in answer.lower() for alt in ["index", "match", "xlookup", "filter"]):
+            if any(alt in answer_lower for alt in ["index", "match", "xlookup", "filter"]):
                 score += 0.3
                 feedback_parts.append("Mentioned alternative lookup methods")
             else:
@@ -147,7 +321,7 @@ class RuleBasedGrader:
         
         # Check for common errors
         if "approximate" in question.lower() and difficulty >= 3:
-            if "approximate" in answer.lower() or "true" in answer.lower() or "1" in answer:
+            if "approximate" in answer_lower or "true" in answer_lower or "1" in answer:
                 score += 0.1
             else:
                 error_tags.append("missing_approximate_match_discussion")
@@ -156,17 +330,21 @@ class RuleBasedGrader:
             passed=score >= 0.6,
             score=min(score, 1.0),
             error_tags=error_tags,
-            feedback="; ".join(feedback_parts)
+            feedback_parts=feedback_parts
         )
     
-    def _grade_if_functions(self, question: str, answer: str, difficulty: int) -> RuleResult:
+    def _grade_if_functions(self, question: str, prep: PreparedAnswer, difficulty: int) -> RuleResult:
         """Grade IF function related answers"""
+        answer = prep.raw
+        answer_upper = prep.upper
         error_tags = []
         score = 0.0
         feedback_parts = []
         
         # Check for IF function syntax
-        if_match = re.search(self.formula_patterns["if"], answer, re.IGNORECASE)
+        if_match = None
+        if "IF" in answer_upper:
+            if_match = self._IF_RE.search(answer)
         if if_match:
             score += 0.3
             feedback_parts.append("Used IF function")
@@ -186,7 +364,7 @@ class RuleBasedGrader:
                 
                 # For difficulty 3+, check for nested IFs
                 if difficulty >= 3:
-                    nested_ifs = len(re.findall(r"IF\s*\(", answer, re.IGNORECASE))
+                    nested_ifs = len(self._IF_CALL_RE.findall(answer))
                     if nested_ifs > 1:
                         score += 0.2
                         feedback_parts.append("Used nested IF functions")
@@ -196,7 +374,7 @@ class RuleBasedGrader:
             error_tags.append("no_if_function")
         
         # Check for logical operators
-        if difficulty >= 3 and any(op in answer.upper() for op in ["AND", "OR"]):
+        if difficulty >= 3 and any(op in answer_upper for op in ["AND", "OR"]):
             score += 0.1
             feedback_parts.append("Used logical operators")
         
@@ -204,36 +382,38 @@ class RuleBasedGrader:
             passed=score >= 0.6,
             score=min(score, 1.0),
             error_tags=error_tags,
-            feedback="; ".join(feedback_parts)
+            feedback_parts=feedback_parts
         )
     
-    def _grade_basic_formulas(self, question: str, answer: str, difficulty: int) -> RuleResult:
+    def _grade_basic_formulas(self, question: str, prep: PreparedAnswer, difficulty: int) -> RuleResult:
         """Grade basic formula questions"""
+        answer = prep.raw
+        answer_lower = prep.lower
         error_tags = []
         score = 0.0
         feedback_parts = []
         
         # Check for formula syntax (starts with =)
-        if answer.strip().startswith("=") or "=" in answer:
+        if "=" in answer:
             score += 0.2
             feedback_parts.append("Used formula syntax")
         
         # Check for SUM function if question involves summing
         if "sum" in question.lower():
-            if re.search(self.formula_patterns["sum"], answer, re.IGNORECASE):
+            if "sum" in answer_lower and self._SUM_RE.search(answer):
                 score += 0.4
                 feedback_parts.append("Used SUM function correctly")
             else:
                 error_tags.append("missing_sum_function")
         
         # Check for proper range syntax
-        if re.search(self.formula_patterns["range"], answer):
+        if self._scan_cell_references(answer)["range"]:
             score += 0.2
             feedback_parts.append("Used proper range notation")
         
         # Check for understanding of basic concepts
         conceptual_words = ["formula", "function", "cell", "range", "reference"]
-        concept_count = sum(1 for word in conceptual_words if word in answer.lower())
+        concept_count = sum(1 for word in conceptual_words if word in answer_lower)
         if concept_count >= 2:
             score += 0.2
             feedback_parts.append("Demonstrated understanding of Excel concepts")
@@ -242,31 +422,31 @@ class RuleBasedGrader:
             passed=score >= 0.6,
             score=min(score, 1.0),
             error_tags=error_tags,
-            feedback="; ".join(feedback_parts)
+            feedback_parts=feedback_parts
         )
     
-    def _grade_pivot_tables(self, question: str, answer: str, difficulty: int) -> RuleResult:
+    def _grade_pivot_tables(self, question: str, prep: PreparedAnswer, difficulty: int) -> RuleResult:
         """Grade pivot table related answers"""
+        answer_lower = prep.lower
         error_tags = []
         score = 0.0
         feedback_parts = []
         
-        pivot_keywords = ["pivot", "pivot table", "summarize", "group", "aggregate"]
-        if any(keyword in answer.lower() for keyword in pivot_keywords):
+        tokens = frozenset(self._WORD_RE.findall(answer_lower))
+        
+        if self._PIVOT_KEYWORDS & tokens:
             score += 0.3
             feedback_parts.append("Mentioned pivot tables")
         
         # Check for understanding of pivot table components
-        components = ["rows", "columns", "values", "filters", "fields"]
-        component_count = sum(1 for comp in components if comp in answer.lower())
+        component_count = len(self._PIVOT_COMPONENTS & tokens)
         score += min(0.3, component_count * 0.1)
         
         if component_count >= 2:
             feedback_parts.append("Understood pivot table structure")
         
         # Check for steps/process
-        step_indicators = ["first", "then", "next", "step", "insert", "create", "drag", "drop"]
-        if any(indicator in answer.lower() for indicator in step_indicators):
+        if self._STEP_INDICATORS & tokens:
             score += 0.2
             feedback_parts.append("Provided step-by-step approach")
         
@@ -274,37 +454,39 @@ class RuleBasedGrader:
             passed=score >= 0.6,
             score=min(score, 1.0),
             error_tags=error_tags,
-            feedback="; ".join(feedback_parts)
+            feedback_parts=feedback_parts
         )
     
-    def _grade_case_analysis(self, question: str, answer: str, difficulty: int) -> RuleResult:
+    def _grade_case_analysis(self, question: str, prep: PreparedAnswer, difficulty: int) -> RuleResult:
         """Grade case study analysis"""
+        answer = prep.raw
+        answer_lower = prep.lower
+        answer_upper = prep.upper
         error_tags = []
         score = 0.0
         feedback_parts = []
         
         # Look for specific formulas mentioned in the case
-        formula_functions = ["AVERAGEIF", "COUNTIF", "INDEX", "MATCH", "VLOOKUP", "DATEDIF", "TODAY"]
-        formula_count = sum(1 for func in formula_functions if func.upper() in answer.upper())
+        formula_count = sum(1 for func in self.FORMULA_FUNCTIONS if func in answer_upper)
         
         score += min(0.4, formula_count * 0.1)
         if formula_count >= 2:
             feedback_parts.append(f"Used {formula_count} relevant functions")
         
         # Check for range references (important in case studies)
-        range_count = len(re.findall(self.formula_patterns["range"], answer))
+        range_count = self._scan_cell_references(answer)["range"]
         if range_count >= 2:
             score += 0.2
             feedback_parts.append("Used appropriate data ranges")
         
         # Check for structured approach (numbered responses)
-        if re.search(r"\d+\.", answer):
+        if self._NUMBERED_ITEM_RE.search(answer):
             score += 0.2
             feedback_parts.append("Provided structured responses")
         
         # Check for explanation/reasoning
         explanation_words = ["because", "since", "this will", "to calculate", "in order to"]
-        if any(word in answer.lower() for word in explanation_words):
+        if any(word in answer_lower for word in explanation_words):
             score += 0.2
             feedback_parts.append("Provided reasoning for approach")
         
@@ -312,21 +494,21 @@ class RuleBasedGrader:
             passed=score >= 0.6,
             score=min(score, 1.0),
             error_tags=error_tags,
-            feedback="; ".join(feedback_parts)
+            feedback_parts=feedback_parts
         )
     
-    def _grade_generic(self, question: str, answer: str, target_skill: str, difficulty: int) -> RuleResult:
+    def _grade_generic(self, question: str, prep: PreparedAnswer, target_skill: str, difficulty: int) -> RuleResult:
         """Generic grading for skills not specifically handled"""
         error_tags = []
         score = 0.5  # Default middle score for generic grading
         feedback_parts = ["Used generic rule-based evaluation"]
         
         # Basic checks
-        if len(answer.strip()) < 10:
+        if len(prep.raw.strip()) < 10:
             score -= 0.2
             error_tags.append("answer_too_short")
         
-        if len(answer.split()) > 20:
+        if prep.word_count > 20:
             score += 0.1
             feedback_parts.append("Provided detailed response")
         
@@ -334,34 +516,74 @@ class RuleBasedGrader:
             passed=score >= 0.6,
             score=min(max(score, 0.0), 1.0),
             error_tags=error_tags,
-            feedback="; ".join(feedback_parts)
+            feedback_parts=feedback_parts
         )
     
+    def _scan_cell_references(self, answer: str) -> Dict[str, int]:
+        """Count absolute, range and relative cell references in one pass"""
+        counts = {"absolute": 0, "range": 0, "relative": 0}
+        for match in self._CELL_REFERENCE_SCAN_RE.finditer(answer):
+            counts[match.lastgroup] += 1
+        return counts
+    
     def _extract_function_params(self, function_str: str) -> List[str]:
         """Extract parameters from a function string"""
-        # Find content between parentheses
-        match = re.search(r"\(([^)]+)\)", function_str)
-        if match:
-            params_str = match.group(1)
-            # Split by comma, but be careful of nested functions
-            params = []
-            current_param = ""
-            paren_depth = 0
-            
-            for char in params_str:
-                if char == '(':
-                    paren_depth += 1
-                elif char == ')':
-                    paren_depth -= 1
-                elif char == ',' and paren_depth == 0:
-                    params.append(current_param.strip())
-                    current_param = ""
-                    continue
-                
-                current_param += char
-            
-            if current_param.strip():
-                params.append(current_param.strip())
-            
-            return params
-        return []
+        # One depth-tracking pass from the first "(": nested calls and quoted
+        # commas stay inside their parameter
+        open_index = function_str.find("(")
+        if open_index < 0:
+            return []
+        params = _call_arguments(function_str, open_index)
+        if params and not params[-1]:
+            params.pop()  # Trailing comma
+        return params
+
+def _call_arguments(text: str, open_index: int) -> List[str]:
+    """Top-level arguments of the call whose "(" is at open_index.
+    
+    Commas inside nested calls or double-quoted strings don't split arguments.
+    """
+    arguments = []
+    depth = 0
+    in_string = False
+    start = open_index + 1
+    for index in range(start, len(text)):
+        char = text[index]
+        if char == '"':
+            in_string = not in_string
+        elif in_string:
+            continue
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            if depth == 0:
+                arguments.append(text[start:index].strip())
+                break
+            depth -= 1
+        elif char == "," and depth == 0:
+            arguments.append(text[start:index].strip())
+            start = index + 1
+    else:
+        arguments.append(text[start:].strip())  # Unclosed call
+    
+    return [] if arguments == [""] else arguments
+
+def _parens_balanced(text: str) -> bool:
+    """True when parentheses outside double-quoted strings pair up and strings are closed"""
+    depth = 0
+    in_string = False
+    for char in text:
+        if char == '"':
+            in_string = not in_string
+        elif in_string:
+            continue
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth < 0:
+                return False
+    return depth == 0 and not in_string
+
+# Global grader instance
+rule_grader = RuleBasedGrader()
@@ -1,13 +1,28 @@
 import anthropic
+import httpx
 from typing import Dict, Any, Optional
 import json
 import asyncio
 from llm.provider_abstraction import BaseLLMClient, LLMResponse
 
+# orjson is optional; fall back to the stdlib parser when it isn't installed
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
 class ClaudeClient(BaseLLMClient):
-    def __init__(self, api_key: str, model_name: str):
-        super().__init__(api_key, model_name)
-        self.client = anthropic.AsyncAnthropic(api_key=api_key)
+    def __init__(self, api_key: str, model_name: str,
+                 http_client: Optional[httpx.AsyncClient] = None):
+        super().__init__(api_key, model_name, http_client)
+        # The SDK keeps whatever client it is given for its lifetime, so only an injected
+        # one is passed; otherwise the SDK manages its own connection pool
+        try:
+            self.client = anthropic.AsyncAnthropic(api_key=api_key, http_client=http_client)
+        except TypeError:
+            # SDK builds that ship their own HTTP stack reject an httpx client
+            self.client = anthropic.AsyncAnthropic(api_key=api_key)
         
         # Model configurations
         self.model_configs = {
@@ -16,33 +31,43 @@ class ClaudeClient(BaseLLMClient):
             "claude-3-opus-20240229": {"max_tokens": 4096, "context_window": 200000},
             "claude-3-sonnet-20240229": {"max_tokens": 4096, "context_window": 200000}
         }
+        
+        # Resolve per-model limits and info once instead of on every call
+        self._model_max_tokens = self.model_configs.get(self.model_name, {}).get("max_tokens", 4096)
+        self._model_info = self._build_model_info()
+    
+    def _build_request(self, prompt: str, temperature: float,
+                       max_tokens: int, json_mode: bool) -> Dict[str, Any]:
+        """Build Messages API arguments for a request"""
+        # Prepare system message for JSON mode
+        system_message = ""
+        if json_mode:
+            system_message = "You are a helpful assistant. Always respond with valid JSON format."
+            prompt = f"{prompt}\n\nPlease respond in valid JSON format."
+        
+        request = {
+            "model": self.model_name,
+            # Clamp to the model's output limit
+            "max_tokens": min(max_tokens, self._model_max_tokens),
+            "temperature": temperature,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ]
+        }
+        if system_message:
+            request["system"] = system_message
+        return request
     
     async def generate(self, prompt: str, temperature: float = 0.7, 
                       max_tokens: int = 1000, json_mode: bool = False) -> LLMResponse:
         """Generate completion using Claude"""
         try:
-            # Prepare system message for JSON mode
-            system_message = ""
-            if json_mode:
-                system_message = "You are a helpful assistant. Always respond with valid JSON format."
-                prompt = f"{prompt}\n\nPlease respond in valid JSON format."
-            
-            # Get max tokens for this model
-            model_max_tokens = self.model_configs.get(self.model_name, {}).get("max_tokens", 4096)
-            effective_max_tokens = min(max_tokens, model_max_tokens)
-            
             # Generate response
             response = await self.client.messages.create(
-                model=self.model_name,
-                max_tokens=effective_max_tokens,
-                temperature=temperature,
-                system=system_message if system_message else None,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ]
+                **self._build_request(prompt, temperature, max_tokens, json_mode)
             )
             
             # Extract usage information
@@ -65,6 +90,10 @@ class ClaudeClient(BaseLLMClient):
     
     def get_model_info(self) -> Dict[str, Any]:
         """Get Claude model information"""
+        return dict(self._model_info)
+    
+    def _build_model_info(self) -> Dict[str, Any]:
+        """Build Claude model information for the configured model"""
         model_info = self.model_configs.get(self.model_name, {})
         
         # Cost information (as of latest pricing)
@@ -85,17 +114,6 @@ class ClaudeClient(BaseLLMClient):
             "strengths": ["Reasoning", "Analysis", "Code quality", "Safety"]
         }
     
-    async def generate_with_retry(self, prompt: str, max_retries: int = 3, **kwargs) -> LLMResponse:
-        """Generate with exponential backoff retry"""
-        for attempt in range(max_retries):
-            try:
-                return await self.generate(prompt, **kwargs)
-            except Exception as e:
-                if attempt == max_retries - 1:
-                    raise e
-                wait_time = 2 ** attempt
-                await asyncio.sleep(wait_time)
-    
     async def analyze_complexity(self, prompt: str) -> Dict[str, Any]:
         """Analyze prompt complexity to determine if Claude is needed"""
         complexity_prompt = f"""
@@ -110,7 +128,7 @@ class ClaudeClient(BaseLLMClient):
         Respond with JSON: {{"complexity": int, "reasoning": "brief explanation"}}
         """
         
-        response = await self.generate(
+        response = await self.generate_cached(
             complexity_prompt,
             temperature=0.1,
             max_tokens=200,
@@ -118,6 +136,6 @@ class ClaudeClient(BaseLLMClient):
         )
         
         try:
-            return json.loads(response.content)
+            return _json_loads(response.content)
         except json.JSONDecodeError:
             return {"complexity": 3, "reasoning": "Unable to parse complexity analysis"}
@@ -1,12 +1,15 @@
 import google.generativeai as genai
+import httpx
 from typing import Dict, Any, Optional
 import json
 import asyncio
 from llm.provider_abstraction import BaseLLMClient, LLMResponse
 
 class GeminiClient(BaseLLMClient):
-    def __init__(self, api_key: str, model_name: str):
-        super().__init__(api_key, model_name)
+    def __init__(self, api_key: str, model_name: str,
+                 http_client: Optional[httpx.AsyncClient] = None):
+        # The Gemini SDK uses its own transport; http_client is accepted for a uniform constructor
+        super().__init__(api_key, model_name, http_client)
         genai.configure(api_key=api_key)
         self.model = genai.GenerativeModel(model_name)
         
@@ -79,14 +82,3 @@ class GeminiClient(BaseLLMClient):
                 "output": 0.001 if "2.0" in self.model_name else 0.0006
             }
         }
-    
-    async def generate_with_retry(self, prompt: str, max_retries: int = 3, **kwargs) -> LLMResponse:
-        """Generate with exponential backoff retry"""
-        for attempt in range(max_retries):
-            try:
-                return await self.generate(prompt, **kwargs)
-            except Exception as e:
-                if attempt == max_retries - 1:
-                    raise e
-                wait_time = 2 ** attempt
-                await asyncio.sleep(wait_time)
@@ -4,9 +4,18 @@ import json
 import asyncio
 from llm.provider_abstraction import BaseLLMClient, LLMResponse
 
+# orjson is optional; fall back to the stdlib parser when it isn't installed
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    orjson = None
+    _json_loads = json.loads
+
 class GroqClient(BaseLLMClient):
-    def __init__(self, api_key: str, model_name: str):
-        super().__init__(api_key, model_name)
+    def __init__(self, api_key: str, model_name: str,
+                 http_client: Optional[httpx.AsyncClient] = None):
+        super().__init__(api_key, model_name, http_client)
         self.base_url = "https://api.groq.com/openai/v1"
         self.headers = {
             "Authorization": f"Bearer {api_key}",
@@ -21,58 +30,69 @@ class GroqClient(BaseLLMClient):
             "mixtral-8x7b-32768": {"max_tokens": 32768, "context_window": 32768},
             "qwen2.5-72b-instruct": {"max_tokens": 8192, "context_window": 32768}
         }
+        
+        # Resolve per-model limits and info once instead of on every call
+        self._model_max_tokens = self.model_configs.get(self.model_name, {}).get("max_tokens", 8192)
+        self._model_info = self._build_model_info()
+    
+    def _build_payload(self, prompt: str, temperature: float, max_tokens: int,
+                       json_mode: bool) -> Dict[str, Any]:
+        """Build the chat completions payload"""
+        payload = {
+            "model": self.model_name,
+            "messages": [
+                {
+                    "role": "user", 
+                    "content": prompt
+                }
+            ],
+            "temperature": temperature,
+            "max_tokens": min(max_tokens, self._model_max_tokens),
+            "stream": False
+        }
+        
+        # Add JSON mode if requested and supported
+        if json_mode:
+            payload["response_format"] = {"type": "json_object"}
+            payload["messages"].insert(0, {
+                "role": "system",
+                "content": "You are a helpful assistant. Always respond with valid JSON."
+            })
+        
+        return payload
     
     async def generate(self, prompt: str, temperature: float = 0.7, 
                       max_tokens: int = 1000, json_mode: bool = False) -> LLMResponse:
         """Generate completion using Groq"""
         try:
-            # Prepare request payload
-            payload = {
-                "model": self.model_name,
-                "messages": [
-                    {
-                        "role": "user", 
-                        "content": prompt
-                    }
-                ],
-                "temperature": temperature,
-                "max_tokens": min(max_tokens, self.model_configs.get(self.model_name, {}).get("max_tokens", 8192)),
-                "stream": False
-            }
+            payload = self._build_payload(prompt, temperature, max_tokens, json_mode)
             
-            # Add JSON mode if requested and supported
-            if json_mode:
-                payload["response_format"] = {"type": "json_object"}
-                payload["messages"].insert(0, {
-                    "role": "system",
-                    "content": "You are a helpful assistant. Always respond with valid JSON."
-                })
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/chat/completions",
-                    headers=self.headers,
-                    json=payload,
-                    timeout=30.0
+            if orjson:
+                response = await self.http_client.post(
+                    f"{self.base_url}/chat/completions", headers=self.headers, content=orjson.dumps(payload)
                 )
-                response.raise_for_status()
-                
-                data = response.json()
-                
-                # Extract usage information
-                usage = data.get("usage", {})
-                usage_dict = {
-                    "prompt_tokens": usage.get("prompt_tokens", 0),
-                    "completion_tokens": usage.get("completion_tokens", 0),
-                    "total_tokens": usage.get("total_tokens", 0)
-                }
-                
-                return LLMResponse(
-                    content=data["choices"][0]["message"]["content"],
-                    usage=usage_dict,
-                    model=self.model_name
+            else:
+                response = await self.http_client.post(
+                    f"{self.base_url}/chat/completions", headers=self.headers, json=payload
                 )
-                
+            response.raise_for_status()
+            
+            data = _json_loads(response.content)
+            
+            # Extract usage information
+            usage = data.get("usage", {})
+            usage_dict = {
+                "prompt_tokens": usage.get("prompt_tokens", 0),
+                "completion_tokens": usage.get("completion_tokens", 0),
+                "total_tokens": usage.get("total_tokens", 0)
+            }
+            
+            return LLMResponse(
+                content=data["choices"][0]["message"]["content"],
+                usage=usage_dict,
+                model=self.model_name
+            )
+            
         except httpx.HTTPError as e:
             raise Exception(f"Groq API HTTP error: {str(e)}")
         except Exception as e:
@@ -80,6 +100,10 @@ class GroqClient(BaseLLMClient):
     
     def get_model_info(self) -> Dict[str, Any]:
         """Get Groq model information"""
+        return dict(self._model_info)
+    
+    def _build_model_info(self) -> Dict[str, Any]:
+        """Build Groq model information for the configured model"""
         model_info = self.model_configs.get(self.model_name, {})
         
         # Cost information (approximate, as Groq has free tier)
@@ -101,29 +125,14 @@ class GroqClient(BaseLLMClient):
             "speed": "Very Fast (up to 750 tokens/sec)"
         }
     
-    async def generate_with_retry(self, prompt: str, max_retries: int = 3, **kwargs) -> LLMResponse:
-        """Generate with exponential backoff retry"""
-        for attempt in range(max_retries):
-            try:
-                return await self.generate(prompt, **kwargs)
-            except Exception as e:
-                if attempt == max_retries - 1:
-                    raise e
-                wait_time = 2 ** attempt
-                await asyncio.sleep(wait_time)
-    
     async def check_rate_limit(self) -> Dict[str, Any]:
         """Check current rate limit status"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/models",
-                    headers=self.headers
-                )
-                return {
-                    "status": "healthy" if response.status_code == 200 else "error",
-                    "rate_limit_remaining": response.headers.get("x-ratelimit-remaining"),
-                    "rate_limit_reset": response.headers.get("x-ratelimit-reset")
-                }
+            response = await self.http_client.get(f"{self.base_url}/models", headers=self.headers)
+            return {
+                "status": "healthy" if response.status_code == 200 else "error",
+                "rate_limit_remaining": response.headers.get("x-ratelimit-remaining"),
+                "rate_limit_reset": response.headers.get("x-ratelimit-reset")
+            }
         except Exception as e:
             return {"status": "error", "error": str(e)}
@@ -1,14 +1,18 @@
 from abc import ABC, abstractmethod
 from typing import Dict, Any, Optional, List
-import os
+from collections import OrderedDict
+import asyncio
+import hashlib
+import httpx
+import logging
+import random
+import threading
+import time
 from enum import Enum
 
-# Load environment variables if not already loaded
-try:
-    from dotenv import load_dotenv
-    load_dotenv(dotenv_path="../.env")  # Load from parent directory
-except ImportError:
-    pass  # dotenv not available, assume env vars are set
+from config import settings
+
+logger = logging.getLogger(__name__)
 
 class LLMProvider(Enum):
     GEMINI = "gemini"
@@ -21,10 +25,122 @@ class LLMResponse:
         self.usage = usage or {}
         self.model = model
 
+class LLMResponseCache:
+    """In-memory LRU cache of LLM responses with a time-to-live"""
+    
+    def __init__(self, max_size: int = 512, ttl_seconds: float = 3600):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[bytes, tuple]" = OrderedDict()
+        # Requests currently being generated, so identical concurrent misses share one call
+        self.inflight: Dict[bytes, asyncio.Task] = {}
+    
+    @staticmethod
+    def make_key(model: str, prompt: str, temperature: float, 
+                 max_tokens: int, json_mode: bool) -> bytes:
+        """Hash the request parameters into a compact cache key"""
+        # The prompt is hashed verbatim: whitespace inside an answer can change its grade
+        raw = f"{model}|{temperature}|{max_tokens}|{json_mode}|{prompt}"
+        return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).digest()
+    
+    def get(self, key: bytes) -> Optional[LLMResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, response = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return response
+    
+    def set(self, key: bytes, response: LLMResponse):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+    
+    def clear(self):
+        self._entries.clear()
+
+# Shared across clients so cached responses survive provider switches
+response_cache = LLMResponseCache()
+
+# One connection pool for every provider so TCP/TLS connections are reused
+_http_client: Optional[httpx.AsyncClient] = None
+_http_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get the shared HTTP client for the running event loop, creating it on first use"""
+    global _http_client, _http_client_loop
+    loop = asyncio.get_running_loop()
+    # Pooled connections belong to the loop that opened them; a new loop needs a new pool
+    if _http_client is None or _http_client.is_closed or _http_client_loop is not loop:
+        _http_client = httpx.AsyncClient(
+            timeout=30.0,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=50)
+        )
+        _http_client_loop = loop
+    return _http_client
+
+async def close_http_client():
+    """Close the shared HTTP client (called on application shutdown)"""
+    global _http_client, _http_client_loop
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+        _http_client_loop = None
+
+class AsyncTokenBucket:
+    """Async token-bucket rate limiter; callers over the rate wait for their turn"""
+    
+    def __init__(self, rate_per_minute: float, burst: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = burst if burst is not None else max(1.0, rate_per_minute / 10.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+    
+    async def acquire(self):
+        """Take a token, sleeping until one is available"""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        # Reserve the token up front; a negative balance queues later callers behind us
+        self._tokens -= 1
+        if self._tokens < 0:
+            try:
+                await asyncio.sleep(-self._tokens / self.rate)
+            except asyncio.CancelledError:
+                # Give the reservation back so a cancelled caller doesn't delay the queue
+                self._tokens += 1
+                raise
+    
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
 class BaseLLMClient(ABC):
-    def __init__(self, api_key: str, model_name: str):
+    # Only low-temperature calls (grading, analysis, summaries) are worth caching
+    CACHEABLE_MAX_TEMPERATURE = 0.3
+    MAX_RETRY_WAIT_SECONDS = 30
+    # Set by LLMProviderManager to throttle requests to the provider
+    rate_limiter: Optional[AsyncTokenBucket] = None
+    
+    def __init__(self, api_key: str, model_name: str,
+                 http_client: Optional[httpx.AsyncClient] = None):
         self.api_key = api_key
         self.model_name = model_name
+        self._http_client = http_client
+    
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        """The injected client, else the shared pool, looked up per request so it's never stale"""
+        if self._http_client is not None:
+            return self._http_client
+        return get_http_client()
     
     @abstractmethod
     async def generate(self, prompt: str, temperature: float = 0.7, 
@@ -32,10 +148,57 @@ class BaseLLMClient(ABC):
         """Generate completion from the model"""
         pass
     
+    async def _generate_limited(self, prompt: str, **kwargs) -> LLMResponse:
+        """Generate completion once the rate limiter allows another request"""
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire()
+        return await self.generate(prompt, **kwargs)
+    
+    async def generate_cached(self, prompt: str, temperature: float = 0.7,
+                             max_tokens: int = 1000, json_mode: bool = False) -> LLMResponse:
+        """Generate completion, reusing cached responses for low-temperature calls"""
+        if temperature > self.CACHEABLE_MAX_TEMPERATURE:
+            return await self._generate_limited(prompt, temperature=temperature,
+                                                max_tokens=max_tokens, json_mode=json_mode)
+        
+        key = response_cache.make_key(
+            f"{type(self).__name__}:{self.model_name}", prompt, temperature, max_tokens, json_mode
+        )
+        cached = response_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        # Join an identical request that is already in flight instead of repeating it
+        task = response_cache.inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._generate_limited(prompt, temperature=temperature,
+                                                                max_tokens=max_tokens, json_mode=json_mode))
+            response_cache.inflight[key] = task
+            task.add_done_callback(lambda _: response_cache.inflight.pop(key, None))
+            # Retrieve the exception even if every waiter was cancelled, so it isn't logged as lost
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        
+        # Shield so one caller being cancelled doesn't fail the others
+        response = await asyncio.shield(task)
+        response_cache.set(key, response)
+        return response
+    
     @abstractmethod
     def get_model_info(self) -> Dict[str, Any]:
         """Get model information and capabilities"""
         pass
+    
+    async def generate_with_retry(self, prompt: str, max_retries: int = 3, **kwargs) -> LLMResponse:
+        """Generate with exponential backoff retry and full jitter"""
+        for attempt in range(max_retries):
+            try:
+                return await self._generate_limited(prompt, **kwargs)
+            except Exception as e:
+                if attempt == max_retries - 1:
+                    raise e
+                # Randomize the wait so concurrent callers don't retry in lockstep
+                wait_time = random.uniform(0, min(self.MAX_RETRY_WAIT_SECONDS, 2 ** attempt))
+                await asyncio.sleep(wait_time)
 
 class MockLLMClient(BaseLLMClient):
     """Mock LLM client for development when real providers aren't available"""
@@ -69,10 +232,19 @@ class LLMProviderManager:
     """Manages LLM provider selection and unified interface"""
     
     def __init__(self):
-        self.provider = os.getenv("PROVIDER", "gemini").lower()
-        self.model_name = os.getenv("MODEL_NAME", self._get_default_model())
+        self.provider = settings().provider
+        self.model_name = settings().model_name or self._get_default_model()
         self.client = None  # Initialize lazily
         self._client_initialized = False
+        # Client construction never awaits, so a thread lock also covers the
+        # sync endpoints FastAPI runs in its threadpool
+        self._init_lock = threading.Lock()
+        # One limiter per provider, shared by every client built for it
+        self._limiters = {
+            "gemini": AsyncTokenBucket(settings().gemini_rpm),
+            "groq": AsyncTokenBucket(settings().groq_rpm),
+            "claude": AsyncTokenBucket(settings().claude_rpm)
+        }
     
     def _get_default_model(self) -> str:
         """Get default model name for current provider"""
@@ -85,34 +257,34 @@ class LLMProviderManager:
     
     def _initialize_client(self) -> BaseLLMClient:
         """Initialize the appropriate LLM client"""
-        print(f"DEBUG: self.provider = '{self.provider}' (type: {type(self.provider)})")
+        logger.debug("Initializing client for provider %r", self.provider)
         try:
             if self.provider == "gemini":
-                print("DEBUG: Matched gemini provider")
+                logger.debug("Matched gemini provider")
                 from llm.gemini import GeminiClient
-                api_key = os.getenv("GEMINI_API_KEY")
+                api_key = settings().gemini_api_key
                 if not api_key:
                     raise ValueError("GEMINI_API_KEY environment variable required")
                 return GeminiClient(api_key, self.model_name)
             
             elif self.provider == "groq":
-                print("DEBUG: Matched groq provider")
+                logger.debug("Matched groq provider")
                 from llm.groq import GroqClient
-                api_key = os.getenv("GROQ_API_KEY")
+                api_key = settings().groq_api_key
                 if not api_key:
                     raise ValueError("GROQ_API_KEY environment variable required")
                 return GroqClient(api_key, self.model_name)
             
             elif self.provider == "claude":
-                print("DEBUG: Matched claude provider")
+                logger.debug("Matched claude provider")
                 from llm.claude import ClaudeClient
-                api_key = os.getenv("ANTHROPIC_API_KEY")
+                api_key = settings().anthropic_api_key
                 if not api_key:
                     raise ValueError("ANTHROPIC_API_KEY environment variable required")
                 return ClaudeClient(api_key, self.model_name)
             
             else:
-                print(f"DEBUG: No match found for provider '{self.provider}'")
+                logger.debug("No match found for provider %r", self.provider)
                 raise ValueError(f"Unsupported provider: {self.provider}")
         
         except ImportError as e:
@@ -121,30 +293,47 @@ class LLMProviderManager:
     
     def _get_client(self) -> BaseLLMClient:
         """Get client with lazy initialization"""
-        if not self._client_initialized:
-            try:
-                print(f"Initializing {self.provider} client...")
-                self.client = self._initialize_client()
-                print(f"Successfully initialized {self.provider} client!")
-                self._client_initialized = True
-            except ImportError as e:
-                # Fallback to a simple mock client for development
-                print(f"Warning: Could not initialize {self.provider} client due to ImportError: {e}")
-                print("Using mock client for development purposes")
-                self.client = MockLLMClient()
-                self._client_initialized = True
-            except Exception as e:
-                print(f"Warning: Could not initialize {self.provider} client due to error: {e}")
-                print("Using mock client for development purposes")
-                self.client = MockLLMClient()
-                self._client_initialized = True
+        if self._client_initialized:
+            return self.client
+        
+        # Double-checked so concurrent first callers build only one client
+        with self._init_lock:
+            if not self._client_initialized:
+                try:
+                    logger.info("Initializing %s client...", self.provider)
+                    self.client = self._initialize_client()
+                    logger.info("Successfully initialized %s client", self.provider)
+                except ImportError as e:
+                    # Fallback to a simple mock client for development
+                    logger.warning("Could not initialize %s client due to ImportError: %s; "
+                                   "using mock client for development purposes", self.provider, e)
+                    self.client = MockLLMClient()
+                except Exception as e:
+                    logger.warning("Could not initialize %s client due to error: %s; "
+                                   "using mock client for development purposes", self.provider, e)
+                    self.client = MockLLMClient()
+                else:
+                    self.client.rate_limiter = self._limiters.get(self.provider)
                 self._client_initialized = True
         return self.client
     
+    async def warm_up(self, send_request: bool = False):
+        """Build the provider client ahead of the first real request.
+        
+        With send_request=True a one-token completion is also sent to open a pooled
+        connection; that is a billable network call, so it is off by default.
+        """
+        client = self._get_client()
+        if send_request:
+            try:
+                await client.generate("ping", temperature=0.0, max_tokens=1)
+            except Exception as e:
+                logger.warning("Provider warm-up request failed: %s", e)
+    
     async def generate_interview_question(self, prompt: str, temperature: float = 0.7) -> str:
         """Generate interview question with appropriate temperature"""
         client = self._get_client()
-        response = await client.generate(
+        response = await client.generate_cached(
             prompt=prompt,
             temperature=temperature,
             max_tokens=800,
@@ -152,13 +341,13 @@ class LLMProviderManager:
         )
         return response.content
     
-    async def grade_answer(self, prompt: str, temperature: float = 0.1) -> str:
+    async def grade_answer(self, prompt: str, temperature: float = 0.1, max_tokens: int = 500) -> str:
         """Grade answer with low temperature for consistency"""
         client = self._get_client()
-        response = await client.generate(
+        response = await client.generate_cached(
             prompt=prompt,
             temperature=temperature,
-            max_tokens=500,
+            max_tokens=max_tokens,
             json_mode=True
         )
         return response.content
@@ -166,7 +355,7 @@ class LLMProviderManager:
     async def generate_summary(self, prompt: str, temperature: float = 0.3) -> str:
         """Generate summary report with moderate creativity"""
         client = self._get_client()
-        response = await client.generate(
+        response = await client.generate_cached(
             prompt=prompt,
             temperature=temperature,
             max_tokens=1200,
@@ -188,18 +377,19 @@ class LLMProviderManager:
         original_provider = self.provider
         original_model = self.model_name
         
-        try:
-            self.provider = provider.lower()
-            self.model_name = model_name or self._get_default_model()
-            self._client_initialized = False  # Force reinitialization
-            self.client = None
-        except Exception as e:
-            # Rollback on failure
-            self.provider = original_provider
-            self.model_name = original_model
-            self._client_initialized = False
-            self.client = None
-            raise e
+        with self._init_lock:
+            try:
+                self.provider = provider.lower()
+                self.model_name = model_name or self._get_default_model()
+                self._client_initialized = False  # Force reinitialization
+                self.client = None
+            except Exception as e:
+                # Rollback on failure
+                self.provider = original_provider
+                self.model_name = original_model
+                self._client_initialized = False
+                self.client = None
+                raise e
 
 # Global provider manager instance
 provider_manager = LLMProviderManager()
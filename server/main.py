@@ -4,21 +4,39 @@ from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import Optional, Dict, Any, List
 import json
+import logging
 import os
 from datetime import datetime
-from dotenv import load_dotenv
+from functools import lru_cache
 
-# Load environment variables
-load_dotenv(dotenv_path="../.env")
-
-from storage.db import get_db, create_tables, InterviewRepository, Turn
+from config import settings
+from storage.db import get_db, create_tables, InterviewRepository
 from agents.interviewer import InterviewAgent
 from summary.report import ReportGenerator
 from api.resume_simple import router as resume_router
 from api.timing import router as timing_router
+from llm.provider_abstraction import close_http_client, get_http_client, provider_manager
+
+logging.basicConfig(level=settings().log_level)
+logger = logging.getLogger(__name__)
+
+# orjson is optional; fall back to the stdlib encoder when it isn't installed
+try:
+    import orjson
+    from fastapi.responses import ORJSONResponse as DefaultResponse
+
+    _json_loads = orjson.loads
+
+    def _json_dumps(value: Any) -> str:
+        return orjson.dumps(value).decode()
+except ImportError:
+    from fastapi.responses import JSONResponse as DefaultResponse
+
+    _json_loads = json.loads
+    _json_dumps = json.dumps
 
 # Initialize FastAPI app
-app = FastAPI(title="Excel Interview System", version="1.0.0")
+app = FastAPI(title="Excel Interview System", version="1.0.0", default_response_class=DefaultResponse)
 
 # Include routers
 app.include_router(resume_router, prefix="/api", tags=["resume"])
@@ -33,10 +51,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Create tables on startup
+# Create tables and warm up the LLM client on startup
 @app.on_event("startup")
-def startup_event():
+async def startup_event():
     create_tables()
+    # Open the shared provider connection pool on the app's loop; shutdown_event closes it
+    get_http_client()
+
+    # Pay the SDK import and client construction cost here, not on the first /turn;
+    # the network round-trip only happens when PREWARM=1
+    await provider_manager.warm_up(send_request=settings().prewarm)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await close_http_client()
 
 # Pydantic models
 class StartInterviewRequest(BaseModel):
@@ -67,6 +95,11 @@ class SummaryResponse(BaseModel):
     recommendations: List[str]
     transcript_excerpts: List[Dict[str, str]]
 
+@lru_cache(maxsize=1)
+def get_agent() -> InterviewAgent:
+    """Shared interview agent; it only holds configuration, per-interview state lives in the DB"""
+    return InterviewAgent()
+
 # WebSocket connection manager
 class ConnectionManager:
     def __init__(self):
@@ -86,24 +119,26 @@ manager = ConnectionManager()
 
 # Routes
 @app.post("/interviews", response_model=InterviewResponse)
-async def start_interview(request: StartInterviewRequest, db: Session = Depends(get_db)):
+async def start_interview(request: StartInterviewRequest, db: Session = Depends(get_db),
+                          agent: InterviewAgent = Depends(get_agent)):
     """Start a new interview session"""
     try:
         repo = InterviewRepository(db)
-        interview = repo.create_interview(candidate_name=request.candidate_name)
-        
-        # Initialize interview agent
-        agent = InterviewAgent()
-        response = agent.start_interview(interview.id)
-        
-        # Add the first turn (intro question)
-        repo.add_turn(
-            interview_id=interview.id,
-            turn_number=1,
-            question=response["question"],
-            target_skill="introduction",
-            difficulty=1
-        )
+        # The interview and its intro turn are committed together
+        with repo.batch():
+            interview = repo.create_interview(candidate_name=request.candidate_name, commit=False)
+            
+            response = agent.start_interview(interview.id)
+            
+            # Add the first turn (intro question)
+            repo.add_turn(
+                interview_id=interview.id,
+                turn_number=1,
+                question=response["question"],
+                target_skill="introduction",
+                difficulty=1,
+                commit=False
+            )
         
         return InterviewResponse(
             id=interview.id,
@@ -121,7 +156,8 @@ async def start_interview(request: StartInterviewRequest, db: Session = Depends(
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/turn", response_model=InterviewResponse)
-async def process_turn(request: TurnRequest, db: Session = Depends(get_db)):
+async def process_turn(request: TurnRequest, db: Session = Depends(get_db),
+                       agent: InterviewAgent = Depends(get_agent)):
     """Process a candidate's answer and generate next question"""
     try:
         repo = InterviewRepository(db)
@@ -131,39 +167,40 @@ async def process_turn(request: TurnRequest, db: Session = Depends(get_db)):
             raise HTTPException(status_code=404, detail="Interview not found")
         
         # Get the current turn to update with answer
-        current_turn = db.query(Turn).filter(
-            Turn.interview_id == request.interview_id
-        ).order_by(Turn.turn_number.desc()).first()
-        
-        if current_turn:
-            repo.update_turn(current_turn.id, answer=request.answer)
+        current_turn = repo.get_latest_turn(request.interview_id)
         
-        # Generate next question using interview agent
-        agent = InterviewAgent()
-        response = agent.process_turn(
-            interview_id=request.interview_id,
-            answer=request.answer,
-            current_state=interview.state,
-            db=db
-        )
-        
-        # Update interview state
-        repo.update_interview(
-            request.interview_id,
-            state=response["state"],
-            coverage_vector=response.get("coverage_vector", {})
-        )
-        
-        # Add next turn if not finished
-        turn_number = current_turn.turn_number + 1 if current_turn else 1
-        if response["next_action"] != "END_INTERVIEW":
-            repo.add_turn(
+        # All writes for this turn are flushed as they happen and committed once at the end
+        with repo.batch():
+            if current_turn:
+                repo.update_turn(current_turn.id, commit=False, answer=request.answer)
+            
+            # Generate next question using interview agent
+            response = agent.process_turn(
                 interview_id=request.interview_id,
-                turn_number=turn_number,
-                question=response["question"],
-                target_skill=response.get("target_skill", "unknown"),
-                difficulty=response.get("difficulty", 1)
+                answer=request.answer,
+                current_state=interview.state,
+                db=db
             )
+            
+            # Update interview state
+            repo.update_interview(
+                request.interview_id,
+                commit=False,
+                state=response["state"],
+                coverage_vector=response.get("coverage_vector", {})
+            )
+            
+            # Add next turn if not finished
+            turn_number = current_turn.turn_number + 1 if current_turn else 1
+            if response["next_action"] != "END_INTERVIEW":
+                repo.add_turn(
+                    interview_id=request.interview_id,
+                    turn_number=turn_number,
+                    question=response["question"],
+                    target_skill=response.get("target_skill", "unknown"),
+                    difficulty=response.get("difficulty", 1),
+                    commit=False
+                )
         
         return InterviewResponse(
             id=request.interview_id,
@@ -185,7 +222,7 @@ async def get_interview_summary(interview_id: int, db: Session = Depends(get_db)
     """Generate and return interview summary report"""
     try:
         repo = InterviewRepository(db)
-        interview = repo.get_interview(interview_id)
+        interview = repo.get_interview_summary(interview_id)
         
         if not interview:
             raise HTTPException(status_code=404, detail="Interview not found")
@@ -205,15 +242,15 @@ async def websocket_endpoint(websocket: WebSocket, interview_id: int):
     try:
         while True:
             data = await websocket.receive_text()
-            message = json.loads(data)
+            message = _json_loads(data)
             
             if message["type"] == "answer":
                 # Process answer and get next question
                 # This would integrate with the turn processing logic
                 response = {"type": "question", "content": "Next question..."}
-                await manager.send_personal_message(json.dumps(response), websocket)
+                await manager.send_personal_message(_json_dumps(response), websocket)
             elif message["type"] == "ping":
-                await manager.send_personal_message(json.dumps({"type": "pong"}), websocket)
+                await manager.send_personal_message(_json_dumps({"type": "pong"}), websocket)
                 
     except WebSocketDisconnect:
         manager.disconnect(websocket)
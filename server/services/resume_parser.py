@@ -4,6 +4,8 @@ Resume parsing and skill extraction service for personalized interviews.
 
 import re
 import io
+import hashlib
+from collections import OrderedDict
 from typing import Dict, List, Set, Optional
 from pathlib import Path
 
@@ -13,31 +15,61 @@ try:
 except ImportError:
     print("Warning: Resume parsing libraries not installed. Run: pip install PyPDF2 python-docx")
 
+# pyahocorasick is optional; without it keywords are matched with substring checks
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# Extracted text keyed by a hash of the uploaded file, so re-uploads skip PDF/DOCX parsing
+_TEXT_CACHE_SIZE = 128
+_extracted_text_cache: "OrderedDict[bytes, str]" = OrderedDict()
+
+# Explicit Excel experience mentions, compiled once
+EXPERIENCE_PATTERNS = [
+    re.compile(pattern) for pattern in [
+        r'(\d+)\s*\+?\s*years?\s+.*excel',
+        r'excel.*(\d+)\s*\+?\s*years?',
+        r'(\d+)\s*years?\s+.*spreadsheet',
+        r'expert.*excel',
+        r'advanced.*excel',
+        r'proficient.*excel'
+    ]
+]
+
 
 class ResumeParser:
     """Parse resumes and extract Excel-relevant skills and experience."""
     
     # Excel skills keywords for extraction
     EXCEL_SKILLS = {
-        'basic': [
+        'basic': (
             'excel', 'spreadsheet', 'microsoft excel', 'ms excel',
             'data entry', 'basic formulas', 'sorting', 'filtering'
-        ],
-        'intermediate': [
+        ),
+        'intermediate': (
             'vlookup', 'hlookup', 'pivot table', 'pivot tables', 'charts',
             'conditional formatting', 'data validation', 'sumif', 'countif',
             'index', 'match', 'concatenate', 'text functions'
-        ],
-        'advanced': [
+        ),
+        'advanced': (
             'macro', 'vba', 'power query', 'power pivot', 'solver',
             'data analysis', 'statistical analysis', 'advanced formulas',
             'array formulas', 'dashboard', 'automation', 'xlookup'
-        ],
-        'expert': [
+        ),
+        'expert': (
             'vba programming', 'excel automation', 'advanced macros',
             'power bi integration', 'sql queries', 'data modeling',
             'financial modeling', 'monte carlo', 'scenario analysis'
-        ]
+        )
+    }
+    
+    DOMAIN_KEYWORDS = {
+        'finance': ('finance', 'financial', 'accounting', 'budget', 'investment', 'banking'),
+        'analytics': ('analytics', 'analysis', 'data science', 'statistics', 'reporting'),
+        'operations': ('operations', 'supply chain', 'inventory', 'logistics', 'procurement'),
+        'sales': ('sales', 'marketing', 'crm', 'revenue', 'forecasting'),
+        'hr': ('hr', 'human resources', 'payroll', 'recruitment', 'workforce')
     }
     
     EXPERIENCE_INDICATORS = [
@@ -45,19 +77,12 @@ class ResumeParser:
         'expert', 'advanced', 'intermediate', 'beginner', 'skilled'
     ]
     
-    def __init__(self):
-        self.skills_found = set()
-        self.experience_level = 'beginner'
-        self.domain_experience = []
-        
     def parse_pdf(self, file_content: bytes) -> str:
         """Extract text from PDF resume."""
         try:
             pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_content))
-            text = ""
-            for page in pdf_reader.pages:
-                text += page.extract_text()
-            return text
+            # extract_text() can return None for pages without a text layer
+            return "".join(page.extract_text() or "" for page in pdf_reader.pages)
         except Exception as e:
             print(f"Error parsing PDF: {e}")
             return ""
@@ -66,93 +91,90 @@ class ResumeParser:
         """Extract text from DOCX resume."""
         try:
             doc = docx.Document(io.BytesIO(file_content))
-            text = ""
-            for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
-            return text
+            return "".join(f"{paragraph.text}\n" for paragraph in doc.paragraphs)
         except Exception as e:
             print(f"Error parsing DOCX: {e}")
             return ""
     
     def extract_text(self, file_content: bytes, filename: str) -> str:
-        """Extract text based on file type."""
-        if filename.lower().endswith('.pdf'):
-            return self.parse_pdf(file_content)
-        elif filename.lower().endswith(('.docx', '.doc')):
-            return self.parse_docx(file_content)
+        """Extract text based on file type, reusing results for identical uploads."""
+        filename_lower = filename.lower()
+        if filename_lower.endswith('.pdf'):
+            file_type, parser = 'pdf', self.parse_pdf
+        elif filename_lower.endswith(('.docx', '.doc')):
+            file_type, parser = 'docx', self.parse_docx
         else:
             # Assume text file
             return file_content.decode('utf-8', errors='ignore')
+        
+        hasher = hashlib.blake2b(file_type.encode(), digest_size=16)
+        hasher.update(file_content)
+        key = hasher.digest()
+        
+        text = _extracted_text_cache.get(key)
+        if text is not None:
+            _extracted_text_cache.move_to_end(key)
+            return text
+        
+        text = parser(file_content)
+        if text:  # Don't cache failed extractions
+            _extracted_text_cache[key] = text
+            if len(_extracted_text_cache) > _TEXT_CACHE_SIZE:
+                _extracted_text_cache.popitem(last=False)
+        return text
+    
+    def _find_keywords(self, text_lower: str) -> Set[str]:
+        """Find every skill and domain keyword that occurs in the text"""
+        if _KEYWORD_AUTOMATON is not None:
+            return {keyword for _, keyword in _KEYWORD_AUTOMATON.iter(text_lower)}
+        return {keyword for keyword in _ALL_KEYWORDS if keyword in text_lower}
     
     def analyze_skills(self, text: str) -> Dict[str, List[str]]:
         """Analyze text and extract Excel skills by category."""
-        text_lower = text.lower()
-        skills_by_level = {
-            'basic': [],
-            'intermediate': [],
-            'advanced': [],
-            'expert': []
-        }
-        
-        for level, skills in self.EXCEL_SKILLS.items():
-            for skill in skills:
-                if skill in text_lower:
-                    skills_by_level[level].append(skill)
-                    self.skills_found.add(skill)
-        
-        return skills_by_level
+        return self._skills_by_level(self._find_keywords(text.lower()))
     
     def extract_experience_level(self, text: str) -> str:
         """Determine experience level based on context."""
         text_lower = text.lower()
-        
+        skills_by_level = self._skills_by_level(self._find_keywords(text_lower))
+        return self._experience_level(text_lower, skills_by_level)
+    
+    def extract_domain_experience(self, text: str) -> List[str]:
+        """Extract domain/industry experience relevant to Excel use cases."""
+        return self._domains(self._find_keywords(text.lower()))
+    
+    def _skills_by_level(self, found_keywords: Set[str]) -> Dict[str, List[str]]:
+        """Group the Excel skills among the found keywords by level."""
+        return {
+            level: [skill for skill in skills if skill in found_keywords]
+            for level, skills in self.EXCEL_SKILLS.items()
+        }
+    
+    def _experience_level(self, text_lower: str, skills_by_level: Dict[str, List[str]]) -> str:
+        """Combine explicit years of experience with the skill levels found."""
         # Look for explicit experience mentions
-        experience_patterns = [
-            r'(\d+)\s*\+?\s*years?\s+.*excel',
-            r'excel.*(\d+)\s*\+?\s*years?',
-            r'(\d+)\s*years?\s+.*spreadsheet',
-            r'expert.*excel',
-            r'advanced.*excel',
-            r'proficient.*excel'
-        ]
-        
         max_years = 0
-        for pattern in experience_patterns:
-            matches = re.findall(pattern, text_lower)
+        for pattern in EXPERIENCE_PATTERNS:
+            matches = pattern.findall(text_lower)
             for match in matches:
                 if isinstance(match, str) and match.isdigit():
                     max_years = max(max_years, int(match))
         
-        # Determine level based on skills and experience
-        skill_levels = self.analyze_skills(text)
-        
-        if skill_levels['expert'] or max_years >= 5:
+        if skills_by_level['expert'] or max_years >= 5:
             return 'expert'
-        elif skill_levels['advanced'] or max_years >= 3:
+        elif skills_by_level['advanced'] or max_years >= 3:
             return 'advanced'
-        elif skill_levels['intermediate'] or max_years >= 1:
+        elif skills_by_level['intermediate'] or max_years >= 1:
             return 'intermediate'
         else:
             return 'beginner'
     
-    def extract_domain_experience(self, text: str) -> List[str]:
-        """Extract domain/industry experience relevant to Excel use cases."""
-        domains = {
-            'finance': ['finance', 'financial', 'accounting', 'budget', 'investment', 'banking'],
-            'analytics': ['analytics', 'analysis', 'data science', 'statistics', 'reporting'],
-            'operations': ['operations', 'supply chain', 'inventory', 'logistics', 'procurement'],
-            'sales': ['sales', 'marketing', 'crm', 'revenue', 'forecasting'],
-            'hr': ['hr', 'human resources', 'payroll', 'recruitment', 'workforce']
-        }
-        
-        text_lower = text.lower()
-        found_domains = []
-        
-        for domain, keywords in domains.items():
-            if any(keyword in text_lower for keyword in keywords):
-                found_domains.append(domain)
-        
-        return found_domains
+    def _domains(self, found_keywords: Set[str]) -> List[str]:
+        """List the domains with at least one keyword among the found keywords."""
+        return [
+            domain for domain, keywords in self.DOMAIN_KEYWORDS.items()
+            if any(keyword in found_keywords for keyword in keywords)
+        ]
     
     def parse_resume(self, file_content: bytes, filename: str) -> Dict:
         """Main method to parse resume and extract relevant information."""
@@ -168,15 +190,18 @@ class ResumeParser:
                 'personalization_data': {}
             }
         
-        # Analyze content
-        skills_by_level = self.analyze_skills(text)
-        experience_level = self.extract_experience_level(text)
-        domains = self.extract_domain_experience(text)
+        # Analyze content: lowercase and scan for keywords once, share the results
+        text_lower = text.lower()
+        found_keywords = self._find_keywords(text_lower)
+        skills_by_level = self._skills_by_level(found_keywords)
+        experience_level = self._experience_level(text_lower, skills_by_level)
+        domains = self._domains(found_keywords)
+        skills_found = [skill for skills in skills_by_level.values() for skill in skills]
         
         # Generate personalization data
         personalization_data = {
-            'has_excel_experience': bool(self.skills_found),
-            'claimed_skills': list(self.skills_found),
+            'has_excel_experience': bool(skills_found),
+            'claimed_skills': skills_found,
             'skill_categories': [level for level, skills in skills_by_level.items() if skills],
             'focus_areas': domains,
             'suggested_difficulty': experience_level
@@ -188,10 +213,29 @@ class ResumeParser:
             'domains': domains,
             'personalization_data': personalization_data,
             'raw_text_length': len(text),
-            'skills_count': len(self.skills_found)
+            'skills_count': len(skills_found)
         }
 
 
+# Every skill and domain keyword, matched in a single pass over the resume text
+_ALL_KEYWORDS = frozenset(
+    [skill for skills in ResumeParser.EXCEL_SKILLS.values() for skill in skills] +
+    [keyword for keywords in ResumeParser.DOMAIN_KEYWORDS.values() for keyword in keywords]
+)
+
+def _build_keyword_automaton():
+    """Build an Aho-Corasick automaton over all keywords, or None if unavailable"""
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for keyword in _ALL_KEYWORDS:
+        automaton.add_word(keyword, keyword)
+    automaton.make_automaton()
+    return automaton
+
+_KEYWORD_AUTOMATON = _build_keyword_automaton()
+
+
 class PersonalizedQuestionGenerator:
     """Generate personalized interview questions based on resume analysis."""
     
@@ -271,7 +315,7 @@ class PersonalizedQuestionGenerator:
                 })
         
         # Skill-specific follow-ups
-        claimed_skills = resume_data.get('personalization_data', {}).get('claimed_skills', [])
+        claimed_skills = frozenset(resume_data.get('personalization_data', {}).get('claimed_skills', []))
         if 'vlookup' in claimed_skills:
             questions.append({
                 'id': 'vlookup_specific',
@@ -2,12 +2,78 @@
 Response timing analytics service for detecting copy-paste and measuring authenticity.
 """
 
+from array import array
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from dataclasses import dataclass, field
+from collections import OrderedDict
+from functools import cached_property
+import heapq
+import time
 from sqlalchemy.orm import Session
 import json
-import statistics
+import numpy as np
+
+# Keystroke type codes stored in ResponseTiming.keystroke_types
+_KS_OTHER = 0
+_KS_CHAR = 1
+_KS_BACKSPACE = 2
+_KS_DELETE = 3
+KEYSTROKE_CODES = {'character': _KS_CHAR, 'backspace': _KS_BACKSPACE, 'delete': _KS_DELETE}
+
+def _naive(timestamp: datetime) -> datetime:
+    """Normalize an incoming timestamp to the naive local clock used by start_time."""
+    return timestamp.replace(tzinfo=None) if timestamp.tzinfo else timestamp
+
+def _column_stats(values: np.ndarray):
+    """(count, mean, median, min, max) over the non-NaN entries; zeros when empty."""
+    present = values[~np.isnan(values)]
+    if present.size == 0:
+        return 0, 0.0, 0.0, 0.0, 0.0
+    return present.size, present.mean(), np.median(present), present.min(), present.max()
+
+class RunningMedian:
+    """Median of a growing stream: O(log n) push, O(1) read."""
+    
+    def __init__(self):
+        self._lo: List[float] = []  # max-heap (negated) of the smaller half
+        self._hi: List[float] = []  # min-heap of the larger half
+    
+    def __len__(self) -> int:
+        return len(self._lo) + len(self._hi)
+    
+    def push(self, value: float):
+        if self._lo and value > -self._lo[0]:
+            heapq.heappush(self._hi, value)
+        else:
+            heapq.heappush(self._lo, -value)
+        # Rebalance so _lo holds the extra element when the count is odd
+        if len(self._lo) > len(self._hi) + 1:
+            heapq.heappush(self._hi, -heapq.heappop(self._lo))
+        elif len(self._hi) > len(self._lo):
+            heapq.heappush(self._lo, -heapq.heappop(self._hi))
+    
+    @property
+    def median(self) -> Optional[float]:
+        if not self._lo:
+            return None
+        if len(self._lo) > len(self._hi):
+            return -self._lo[0]
+        return (-self._lo[0] + self._hi[0]) / 2
+
+# Active timings are keyed by (interview_id, question_id)
+TimingKey = Tuple[int, str]
+
+def format_timing_key(key: TimingKey) -> str:
+    """Opaque string form of a timing key for API clients."""
+    return f"{key[0]}_{key[1]}"
+
+def parse_timing_key(raw: str) -> Optional[TimingKey]:
+    """Inverse of format_timing_key; None for malformed keys."""
+    interview_id, sep, question_id = raw.partition("_")
+    if not sep or not interview_id.isdigit():
+        return None
+    return int(interview_id), question_id
 
 @dataclass
 class ResponseTiming:
@@ -15,51 +81,62 @@ class ResponseTiming:
     question_id: str
     question_text: str
     start_time: datetime
-    first_keystroke_time: Optional[datetime] = None
-    submission_time: Optional[datetime] = None
-    keystrokes: List[Dict[str, Any]] = field(default_factory=list)
+    # Monotonic clock reading taken alongside start_time
+    start_perf: float = field(default_factory=time.perf_counter)
+    # Event times below are seconds elapsed since start_time
+    first_keystroke_at: Optional[float] = None
+    submission_at: Optional[float] = None
+    # Keystrokes as parallel columns: elapsed seconds and KEYSTROKE_CODES values
+    keystroke_ts: array = field(default_factory=lambda: array('d'))
+    keystroke_types: array = field(default_factory=lambda: array('B'))
     paste_events: List[Dict[str, Any]] = field(default_factory=list)
     focus_events: List[Dict[str, Any]] = field(default_factory=list)
+    # Running counters maintained by ResponseTimingService.record_*
+    char_keystroke_count: int = 0
+    blur_count: int = 0
     
-    @property
+    # Derived metrics, cached on first read; only final once the response is finished
+    METRICS = ('time_to_first_keystroke', 'total_response_time', 'typing_speed',
+               'authenticity_score')
+    
+    def elapsed(self, timestamp: Optional[datetime] = None) -> float:
+        """Seconds since start_time, for a client timestamp or (if omitted) right now.
+        
+        Server-side events use the monotonic clock, so wall clock jumps can't skew them.
+        """
+        if timestamp is None:
+            return time.perf_counter() - self.start_perf
+        return (_naive(timestamp) - self.start_time).total_seconds()
+    
+    def compute_metrics(self):
+        """Drop any stale cached metrics and derive each of them exactly once."""
+        for name in self.METRICS:
+            self.__dict__.pop(name, None)
+        for name in self.METRICS:
+            getattr(self, name)
+    
+    @cached_property
     def time_to_first_keystroke(self) -> Optional[float]:
         """Time in seconds from question display to first keystroke."""
-        if self.first_keystroke_time:
-            # Ensure both times are timezone-naive for calculation
-            start_time = self.start_time.replace(tzinfo=None) if self.start_time.tzinfo else self.start_time
-            first_time = self.first_keystroke_time.replace(tzinfo=None) if self.first_keystroke_time.tzinfo else self.first_keystroke_time
-            return (first_time - start_time).total_seconds()
-        return None
+        return self.first_keystroke_at
     
-    @property
+    @cached_property
     def total_response_time(self) -> Optional[float]:
         """Total time to complete response in seconds."""
-        if self.submission_time:
-            # Ensure both times are timezone-naive for calculation
-            start_time = self.start_time.replace(tzinfo=None) if self.start_time.tzinfo else self.start_time
-            submission_time = self.submission_time.replace(tzinfo=None) if self.submission_time.tzinfo else self.submission_time
-            return (submission_time - start_time).total_seconds()
-        return None
+        return self.submission_at
     
-    @property
+    @cached_property
     def typing_speed(self) -> Optional[float]:
         """Calculate average typing speed in characters per minute."""
-        if not self.keystrokes or not self.submission_time or not self.first_keystroke_time:
+        if not self.keystroke_ts or self.submission_at is None or self.first_keystroke_at is None:
             return None
         
-        # Ensure both times are timezone-naive for calculation
-        submission_time = self.submission_time.replace(tzinfo=None) if self.submission_time.tzinfo else self.submission_time
-        first_time = self.first_keystroke_time.replace(tzinfo=None) if self.first_keystroke_time.tzinfo else self.first_keystroke_time
-        
-        typing_duration = (submission_time - first_time).total_seconds()
+        typing_duration = self.submission_at - self.first_keystroke_at
         if typing_duration <= 0:
             return None
         
-        # Count actual typing keystrokes (exclude backspace, etc.)
-        typing_events = [k for k in self.keystrokes if k.get('type') == 'character']
-        chars_typed = len(typing_events)
-        
-        return (chars_typed / typing_duration) * 60  # chars per minute
+        # Only actual typing keystrokes count (backspace etc. are excluded)
+        return (self.char_keystroke_count / typing_duration) * 60  # chars per minute
     
     @property
     def paste_count(self) -> int:
@@ -69,48 +146,75 @@ class ResponseTiming:
     @property
     def focus_loss_count(self) -> int:
         """Number of times user lost focus (tab switching)."""
-        return len([f for f in self.focus_events if f.get('type') == 'blur'])
+        return self.blur_count
     
-    @property
+    @cached_property
     def authenticity_score(self) -> float:
         """Calculate authenticity score (0-1, higher = more authentic)."""
-        score = 1.0
-        
-        # Penalty for excessive paste events
-        if self.paste_count > 0:
-            score -= min(0.5, self.paste_count * 0.2)
-        
-        # Penalty for focus loss (tab switching)
-        if self.focus_loss_count > 0:
-            score -= min(0.3, self.focus_loss_count * 0.1)
-        
-        # Penalty for unrealistic typing speed
-        if self.typing_speed and self.typing_speed > 200:  # > 200 CPM is suspicious
-            score -= 0.3
-        
-        # Penalty for too quick response (likely copy-paste)
-        if self.time_to_first_keystroke and self.time_to_first_keystroke < 2:
-            score -= 0.2
-        
-        # Penalty for very slow first response (likely searching)
-        if self.time_to_first_keystroke and self.time_to_first_keystroke > 60:
-            score -= 0.2
-        
-        return max(0.0, score)
+        return float(authenticity_scores_batch([self])[0])
+    
+    def authenticity_features(self) -> List[float]:
+        """Penalty inputs for authenticity scoring, in _AUTH_WEIGHTS order."""
+        typing_speed = self.typing_speed
+        first_keystroke = self.time_to_first_keystroke
+        return [
+            self.paste_count,
+            self.focus_loss_count,
+            bool(typing_speed and typing_speed > 200),  # > 200 CPM is suspicious
+            bool(first_keystroke and first_keystroke < 2),  # too quick, likely copy-paste
+            bool(first_keystroke and first_keystroke > 60),  # very slow, likely searching
+        ]
+
+# Authenticity penalty per unit of each feature, and the most each feature can cost:
+# paste events, focus losses, fast typing, instant start, very slow start
+_AUTH_WEIGHTS = np.array([0.2, 0.1, 0.3, 0.2, 0.2])
+_AUTH_CAPS = np.array([0.5, 0.3, 1.0, 1.0, 1.0])
+
+def authenticity_scores_batch(timings: List[ResponseTiming]) -> np.ndarray:
+    """Authenticity scores (0-1) for many timings at once."""
+    features = np.array([t.authenticity_features() for t in timings], dtype=np.float64)
+    penalties = np.minimum(_AUTH_CAPS, features * _AUTH_WEIGHTS)
+    # Subtract feature by feature rather than the summed penalty, so scores round
+    # exactly like the sequential deductions they replace
+    scores = np.ones(len(timings))
+    for column in penalties.T:
+        scores -= column
+    return np.maximum(0.0, scores)
 
 class ResponseTimingService:
     """Service for tracking and analyzing response timing patterns."""
     
+    # Timings never finished (closed tab, dropped connection) are discarded after this long
+    ABANDONED_TIMING_TTL = 2 * 60 * 60
+    
+    # Interviews whose running medians are kept, least recently finished dropped first
+    MAX_TRACKED_INTERVIEWS = 1024
+    
     def __init__(self):
-        self.active_timings: Dict[str, ResponseTiming] = {}
+        # Kept in start order, oldest first
+        self.active_timings: Dict[TimingKey, ResponseTiming] = {}
+        # Per-interview running medians of finished responses, for mid-interview analytics
+        self.interview_medians: "OrderedDict[int, Dict[str, RunningMedian]]" = OrderedDict()
+    
+    def _expire_abandoned(self):
+        """Drop timings older than ABANDONED_TIMING_TTL from the front of active_timings."""
+        cutoff = time.perf_counter() - self.ABANDONED_TIMING_TTL
+        while self.active_timings:
+            oldest_key = next(iter(self.active_timings))
+            if self.active_timings[oldest_key].start_perf >= cutoff:
+                break
+            del self.active_timings[oldest_key]
     
     def start_question_timing(self, 
                             interview_id: int, 
                             question_id: str, 
-                            question_text: str) -> str:
+                            question_text: str) -> TimingKey:
         """Start timing for a new question."""
-        timing_key = f"{interview_id}_{question_id}"
+        self._expire_abandoned()
+        timing_key = (interview_id, question_id)
         
+        # Re-inserting moves a restarted timing to the back, keeping start order
+        self.active_timings.pop(timing_key, None)
         self.active_timings[timing_key] = ResponseTiming(
             question_id=question_id,
             question_text=question_text,
@@ -119,134 +223,153 @@ class ResponseTimingService:
         
         return timing_key
     
-    def record_first_keystroke(self, timing_key: str, timestamp: datetime = None):
+    def record_first_keystroke(self, timing_key: TimingKey, timestamp: datetime = None):
         """Record the first keystroke time."""
-        if timing_key in self.active_timings:
-            timing = self.active_timings[timing_key]
-            if not timing.first_keystroke_time:
-                timing.first_keystroke_time = timestamp or datetime.now()
+        timing = self.active_timings.get(timing_key)
+        if timing is not None:
+            if timing.first_keystroke_at is None:
+                timing.first_keystroke_at = timing.elapsed(timestamp)
     
     def record_keystroke(self,
-                        timing_key: str, 
+                        timing_key: TimingKey, 
                         keystroke_type: str,
                         char: str = None,
                         timestamp: datetime = None):
         """Record individual keystroke events."""
-        if timing_key in self.active_timings:
-            timing = self.active_timings[timing_key]
-            
-            # Ensure consistent timezone handling
-            if timestamp and timestamp.tzinfo is not None:
-                timestamp = timestamp.replace(tzinfo=None)
-            
-            actual_timestamp = timestamp or datetime.now()
+        timing = self.active_timings.get(timing_key)
+        if timing is not None:
+            elapsed = timing.elapsed(timestamp)
             
-            timing.keystrokes.append({
-                'type': keystroke_type,  # 'character', 'backspace', 'delete', etc.
-                'char': char,
-                'timestamp': actual_timestamp
-            })
+            # The typed character itself is not kept, only when and what kind
+            timing.keystroke_ts.append(elapsed)
+            timing.keystroke_types.append(KEYSTROKE_CODES.get(keystroke_type, _KS_OTHER))
             
-            # Set first keystroke time if this is the first typing event
-            if not timing.first_keystroke_time and keystroke_type == 'character':
-                timing.first_keystroke_time = actual_timestamp
+            if keystroke_type == 'character':
+                timing.char_keystroke_count += 1
+                # Set first keystroke time if this is the first typing event
+                if timing.first_keystroke_at is None:
+                    timing.first_keystroke_at = elapsed
     
     def record_paste_event(self, 
-                          timing_key: str, 
+                          timing_key: TimingKey, 
                           content_length: int,
                           timestamp: datetime = None):
         """Record paste events with content analysis."""
-        if timing_key in self.active_timings:
-            timing = self.active_timings[timing_key]
-            
-            # Ensure consistent timezone handling
-            if timestamp and timestamp.tzinfo is not None:
-                timestamp = timestamp.replace(tzinfo=None)
-                
+        timing = self.active_timings.get(timing_key)
+        if timing is not None:
             timing.paste_events.append({
-                'timestamp': timestamp or datetime.now(),
+                'elapsed': timing.elapsed(timestamp),
                 'content_length': content_length,
                 'suspicious': content_length > 100  # Large pastes are suspicious
             })
     
     def record_focus_event(self, 
-                          timing_key: str, 
+                          timing_key: TimingKey, 
                           event_type: str,
                           timestamp: datetime = None):
         """Record focus/blur events (tab switching detection)."""
-        if timing_key in self.active_timings:
-            timing = self.active_timings[timing_key]
-            
-            # Ensure consistent timezone handling
-            if timestamp and timestamp.tzinfo is not None:
-                timestamp = timestamp.replace(tzinfo=None)
-                
+        timing = self.active_timings.get(timing_key)
+        if timing is not None:
             timing.focus_events.append({
                 'type': event_type,  # 'focus' or 'blur'
-                'timestamp': timestamp or datetime.now()
+                'elapsed': timing.elapsed(timestamp)
             })
+            if event_type == 'blur':
+                timing.blur_count += 1
     
     def finish_response_timing(self, 
-                              timing_key: str, 
+                              timing_key: TimingKey, 
                               final_answer: str,
                               timestamp: datetime = None) -> ResponseTiming:
         """Complete timing analysis for a response."""
-        if timing_key in self.active_timings:
-            timing = self.active_timings[timing_key]
-            
-            # Ensure consistent timezone handling
-            if timestamp:
-                # Remove timezone info if present to match start_time
-                if timestamp.tzinfo is not None:
-                    timestamp = timestamp.replace(tzinfo=None)
-            
-            timing.submission_time = timestamp or datetime.now()
+        timing = self.active_timings.get(timing_key)
+        if timing is not None:
+            timing.submission_at = timing.elapsed(timestamp)
             
             # Analyze final answer for additional insights
             timing.final_answer_length = len(final_answer)
             timing.final_answer_words = len(final_answer.split())
+            timing.compute_metrics()
+            self._update_running_medians(timing_key[0], timing)
             
             # Remove from active timings and return completed timing
             return self.active_timings.pop(timing_key)
         
         return None
     
+    def _update_running_medians(self, interview_id: int, timing: ResponseTiming):
+        medians = self.interview_medians.get(interview_id)
+        if medians is None:
+            medians = {'response_time': RunningMedian(), 'typing_speed': RunningMedian()}
+            self.interview_medians[interview_id] = medians
+            if len(self.interview_medians) > self.MAX_TRACKED_INTERVIEWS:
+                self.interview_medians.popitem(last=False)
+        else:
+            self.interview_medians.move_to_end(interview_id)
+        
+        # Same filtering as analyze_interview_patterns: missing or zero values are skipped
+        if timing.total_response_time:
+            medians['response_time'].push(timing.total_response_time)
+        if timing.typing_speed:
+            medians['typing_speed'].push(timing.typing_speed)
+    
+    def get_running_medians(self, interview_id: int) -> Dict[str, Optional[float]]:
+        """Current response time and typing speed medians for an in-progress interview."""
+        medians = self.interview_medians.get(interview_id)
+        if medians is None:
+            return {'response_time': None, 'typing_speed': None}
+        return {metric: running.median for metric, running in medians.items()}
+    
     def analyze_interview_patterns(self, 
                                  timings: List[ResponseTiming]) -> Dict[str, Any]:
         """Analyze overall timing patterns for an interview."""
         if not timings:
             return {'error': 'No timing data available'}
         
-        # Calculate aggregate metrics
-        response_times = [t.total_response_time for t in timings if t.total_response_time]
-        first_keystroke_times = [t.time_to_first_keystroke for t in timings if t.time_to_first_keystroke]
-        typing_speeds = [t.typing_speed for t in timings if t.typing_speed]
-        authenticity_scores = [t.authenticity_score for t in timings]
+        # Gather every metric in one pass; NaN marks a missing value and is
+        # skipped by the reductions
+        count = len(timings)
+        response_times = np.empty(count, dtype=np.float64)
+        first_keystroke_times = np.empty(count, dtype=np.float64)
+        typing_speeds = np.empty(count, dtype=np.float64)
+        total_paste_events = 0
+        total_focus_losses = 0
+        
+        for i, t in enumerate(timings):
+            response_time = t.total_response_time
+            first_keystroke = t.time_to_first_keystroke
+            typing_speed = t.typing_speed
+            response_times[i] = response_time if response_time else np.nan
+            first_keystroke_times[i] = first_keystroke if first_keystroke else np.nan
+            typing_speeds[i] = typing_speed if typing_speed else np.nan
+            total_paste_events += t.paste_count
+            total_focus_losses += t.focus_loss_count
         
-        total_paste_events = sum(t.paste_count for t in timings)
-        total_focus_losses = sum(t.focus_loss_count for t in timings)
+        rt_count, rt_mean, rt_median, rt_min, rt_max = _column_stats(response_times)
+        fk_count, fk_mean, fk_median, _, _ = _column_stats(first_keystroke_times)
+        ts_count, ts_mean, ts_median, _, ts_max = _column_stats(typing_speeds)
         
         analysis = {
-            'question_count': len(timings),
+            'question_count': count,
             'total_paste_events': total_paste_events,
             'total_focus_losses': total_focus_losses,
-            'average_authenticity_score': statistics.mean(authenticity_scores) if authenticity_scores else 0,
+            'average_authenticity_score': float(authenticity_scores_batch(timings).mean()),
             
             'response_time_stats': {
-                'mean': statistics.mean(response_times) if response_times else 0,
-                'median': statistics.median(response_times) if response_times else 0,
-                'min': min(response_times) if response_times else 0,
-                'max': max(response_times) if response_times else 0
+                'mean': float(rt_mean) if rt_count else 0,
+                'median': float(rt_median) if rt_count else 0,
+                'min': float(rt_min) if rt_count else 0,
+                'max': float(rt_max) if rt_count else 0
             },
             
             'first_keystroke_stats': {
-                'mean': statistics.mean(first_keystroke_times) if first_keystroke_times else 0,
-                'median': statistics.median(first_keystroke_times) if first_keystroke_times else 0,
+                'mean': float(fk_mean) if fk_count else 0,
+                'median': float(fk_median) if fk_count else 0,
             },
             
             'typing_speed_stats': {
-                'mean': statistics.mean(typing_speeds) if typing_speeds else 0,
-                'median': statistics.median(typing_speeds) if typing_speeds else 0,
+                'mean': float(ts_mean) if ts_count else 0,
+                'median': float(ts_median) if ts_count else 0,
             },
             
             'red_flags': []
@@ -263,15 +386,15 @@ class ResponseTimingService:
             analysis['red_flags'].append(f"Low authenticity score: {analysis['average_authenticity_score']:.2f}")
         
         # Check for unusual patterns
-        if typing_speeds:
-            max_typing_speed = max(typing_speeds)
+        if ts_count:
+            max_typing_speed = float(ts_max)
             if max_typing_speed > 150:
                 analysis['red_flags'].append(f"Unusually fast typing: {max_typing_speed:.0f} CPM")
         
-        if first_keystroke_times:
-            very_quick_responses = [t for t in first_keystroke_times if t < 1]
-            if len(very_quick_responses) > 1:
-                analysis['red_flags'].append(f"Multiple instant responses: {len(very_quick_responses)}")
+        # NaN compares False, so missing first keystrokes are not counted
+        very_quick_responses = int(np.count_nonzero(first_keystroke_times < 1))
+        if very_quick_responses > 1:
+            analysis['red_flags'].append(f"Multiple instant responses: {very_quick_responses}")
         
         return analysis
 
@@ -1,13 +1,18 @@
-from sqlalchemy import create_engine, MetaData
-from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy import create_engine, MetaData, event, func, insert
+from sqlalchemy.orm import sessionmaker, Session, load_only, selectinload
 from sqlalchemy.ext.declarative import declarative_base
 import os
-from typing import Generator
+import random
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Generator, Iterator, List, Optional
+from weakref import WeakKeyDictionary
 
+from config import settings
 from storage.models import Base, Interview, Turn, Rubric, Question
 
 # Database configuration
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./interviews.db")
+DATABASE_URL = settings().database_url
 
 # Ensure directory exists for SQLite database
 if DATABASE_URL.startswith("sqlite:///"):
@@ -19,11 +24,29 @@ if DATABASE_URL.startswith("sqlite:///"):
 
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+if DATABASE_URL.startswith("sqlite"):
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragma(dbapi_connection, connection_record):
+        """WAL lets readers run alongside a writer and avoids a full fsync per commit"""
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA mmap_size=268435456")  # 256 MB
+        cursor.execute("PRAGMA cache_size=-65536")  # 64 MB
+        cursor.close()
+
+# Objects keep their loaded state after commit; every default is Python-side and the
+# primary key comes back from the INSERT, so nothing needs re-selecting
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 
 def create_tables():
     """Create all database tables"""
     Base.metadata.create_all(bind=engine)
+    # create_all skips indexes on tables that already exist
+    for table in (Turn.__table__, Question.__table__):
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
 
 def get_db() -> Generator[Session, None, None]:
     """Database session dependency"""
@@ -37,27 +60,60 @@ class InterviewRepository:
     def __init__(self, db: Session):
         self.db = db
     
-    def create_interview(self, candidate_name: str = None) -> Interview:
+    @contextmanager
+    def batch(self) -> Iterator["InterviewRepository"]:
+        """Commit every write made inside the block once at the end, or roll all of it back.
+        
+        Writes inside the block should pass commit=False.
+        """
+        try:
+            yield self
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+    
+    def create_interview(self, candidate_name: str = None, commit: bool = True) -> Interview:
         interview = Interview(candidate_name=candidate_name)
         self.db.add(interview)
-        self.db.commit()
-        self.db.refresh(interview)
+        self._save(interview, commit)
         return interview
     
     def get_interview(self, interview_id: int) -> Interview:
-        return self.db.query(Interview).filter(Interview.id == interview_id).first()
+        # A turn looks the interview up several times; the identity map answers the repeats.
+        # Interviews are mutable, so they're deliberately not cached across sessions.
+        return self.db.get(Interview, interview_id)
+    
+    def get_interview_summary(self, interview_id: int) -> Optional[Interview]:
+        """Interview with only id, state and total score loaded, for existence/state checks"""
+        return self.db.get(
+            Interview, interview_id,
+            options=[load_only(Interview.id, Interview.state, Interview.total_score)]
+        )
     
-    def update_interview(self, interview_id: int, **kwargs) -> Interview:
+    def get_interview_with_turns(self, interview_id: int) -> Optional[Interview]:
+        """Interview with all its turns, including the deferred error tags, in two queries"""
+        return self.db.query(Interview).options(
+            selectinload(Interview.turns).undefer(Turn.error_tags)
+        ).filter(Interview.id == interview_id).first()
+    
+    def _save(self, obj, commit: bool):
+        """Commit, or just flush when the caller commits a larger unit of work"""
+        if commit:
+            self.db.commit()
+        else:
+            self.db.flush()
+    
+    def update_interview(self, interview_id: int, commit: bool = True, **kwargs) -> Interview:
         interview = self.get_interview(interview_id)
         if interview:
             for key, value in kwargs.items():
                 setattr(interview, key, value)
-            self.db.commit()
-            self.db.refresh(interview)
+            self._save(interview, commit)
         return interview
     
     def add_turn(self, interview_id: int, turn_number: int, question: str, 
-                 target_skill: str, difficulty: int) -> Turn:
+                 target_skill: str, difficulty: int, commit: bool = True) -> Turn:
         turn = Turn(
             interview_id=interview_id,
             turn_number=turn_number,
@@ -66,19 +122,45 @@ class InterviewRepository:
             difficulty=difficulty
         )
         self.db.add(turn)
-        self.db.commit()
-        self.db.refresh(turn)
+        self._save(turn, commit)
         return turn
     
-    def update_turn(self, turn_id: int, **kwargs) -> Turn:
-        turn = self.db.query(Turn).filter(Turn.id == turn_id).first()
+    def add_turns_bulk(self, interview_id: int, turns: List[Dict[str, Any]],
+                       commit: bool = True) -> None:
+        """Insert many turns with a single executemany INSERT.
+        
+        Each dict holds Turn column values (turn_number, question, target_skill, ...).
+        """
+        if not turns:
+            return
+        self.db.execute(insert(Turn), [{**turn, "interview_id": interview_id} for turn in turns])
+        if commit:
+            self.db.commit()
+    
+    def count_turns(self, interview_id: int) -> int:
+        """Number of turns asked so far, counted in SQL rather than by loading them"""
+        return self.db.query(func.count(Turn.id)).filter(
+            Turn.interview_id == interview_id
+        ).scalar()
+    
+    def get_latest_turn(self, interview_id: int) -> Optional[Turn]:
+        return self.db.query(Turn).filter(
+            Turn.interview_id == interview_id
+        ).order_by(Turn.turn_number.desc()).first()
+    
+    def update_turn(self, turn_id: int, commit: bool = True, **kwargs) -> Turn:
+        # Session.get serves already-loaded turns from the identity map
+        turn = self.db.get(Turn, turn_id)
         if turn:
             for key, value in kwargs.items():
                 setattr(turn, key, value)
-            self.db.commit()
-            self.db.refresh(turn)
+            self._save(turn, commit)
         return turn
 
+# Rubrics are seeded once and only read at runtime; keep them per process for a while
+RUBRIC_CACHE_TTL = 300
+_rubric_cache: Dict[Optional[str], tuple] = {}
+
 class RubricRepository:
     def __init__(self, db: Session):
         self.db = db
@@ -94,14 +176,39 @@ class RubricRepository:
         )
         self.db.add(rubric)
         self.db.commit()
-        self.db.refresh(rubric)
+        _rubric_cache.clear()
         return rubric
     
+    def _cached_rubrics(self, skill_name: Optional[str]) -> List[Rubric]:
+        """Rubrics for one skill (or all of them for None), detached so any session can read them"""
+        entry = _rubric_cache.get(skill_name)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+        
+        query = self.db.query(Rubric)
+        if skill_name is not None:
+            query = query.filter(Rubric.skill_name == skill_name)
+        rubrics = query.all()
+        for rubric in rubrics:
+            self.db.expunge(rubric)
+        _rubric_cache[skill_name] = (time.monotonic() + RUBRIC_CACHE_TTL, rubrics)
+        return rubrics
+    
     def get_rubrics_by_skill(self, skill_name: str):
-        return self.db.query(Rubric).filter(Rubric.skill_name == skill_name).all()
+        return list(self._cached_rubrics(skill_name))
     
     def get_all_rubrics(self):
-        return self.db.query(Rubric).all()
+        return list(self._cached_rubrics(None))
+
+# Question ids per (skill, difficulty) for the whole bank, loaded with one query so
+# random picks skip the table scan; refreshed on the same schedule as rubrics. Kept per
+# database (the engine or connection a session is bound to) as (expires, index), since
+# ids from one database mean nothing in another
+QUESTION_INDEX_TTL = RUBRIC_CACHE_TTL
+_question_indexes: "WeakKeyDictionary[Any, tuple]" = WeakKeyDictionary()
+
+def _invalidate_question_index(db: Session):
+    _question_indexes.pop(db.get_bind(), None)
 
 class QuestionRepository:
     def __init__(self, db: Session):
@@ -120,7 +227,7 @@ class QuestionRepository:
         )
         self.db.add(question)
         self.db.commit()
-        self.db.refresh(question)
+        _invalidate_question_index(self.db)
         return question
     
     def get_questions_by_skill(self, skill: str, difficulty: int = None):
@@ -129,8 +236,33 @@ class QuestionRepository:
             query = query.filter(Question.difficulty == difficulty)
         return query.all()
     
-    def get_random_question(self, skill: str, difficulty: int):
-        return self.db.query(Question).filter(
-            Question.skill == skill,
-            Question.difficulty == difficulty
-        ).first()
+    def _load_question_index(self) -> Dict[tuple, List[int]]:
+        bind = self.db.get_bind()
+        entry = _question_indexes.get(bind)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+        
+        index: Dict[tuple, List[int]] = {}
+        for question_id, skill, difficulty in self.db.query(
+            Question.id, Question.skill, Question.difficulty
+        ):
+            index.setdefault((skill, difficulty), []).append(question_id)
+        # An empty bank isn't cached so questions seeded later still show up
+        if index:
+            _question_indexes[bind] = (time.monotonic() + QUESTION_INDEX_TTL, index)
+        return index
+    
+    def _get_question_ids(self, skill: str, difficulty: int) -> List[int]:
+        return self._load_question_index().get((skill, difficulty), [])
+    
+    def get_random_question(self, skill: str, difficulty: int) -> Optional[Question]:
+        ids = self._get_question_ids(skill, difficulty)
+        if not ids:
+            return None
+        question = self.db.get(Question, random.choice(ids))
+        if question is None:
+            # Cached id was deleted elsewhere; reload the index and retry once
+            _invalidate_question_index(self.db)
+            ids = self._get_question_ids(skill, difficulty)
+            question = self.db.get(Question, random.choice(ids)) if ids else None
+        return question
@@ -1,25 +1,30 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float, JSON, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Float, JSON, Text, ForeignKey, Index
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
-from datetime import datetime
+from sqlalchemy.orm import relationship, deferred
+from datetime import datetime, timezone
 from typing import Optional, Dict, Any
 
 Base = declarative_base()
 
+def utcnow() -> datetime:
+    """Current UTC time as a naive datetime, matching what the DateTime columns store"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
 class Interview(Base):
     __tablename__ = "interviews"
     
     id = Column(Integer, primary_key=True, index=True)
     candidate_name = Column(String, nullable=True)
-    start_time = Column(DateTime, default=datetime.utcnow)
+    start_time = Column(DateTime, default=utcnow)
     end_time = Column(DateTime, nullable=True)
     state = Column(String, default="INTRO")
     total_score = Column(Float, nullable=True)
     difficulty_level = Column(Integer, default=1)
     coverage_vector = Column(JSON, default=dict)  # Track skills covered
-    additional_info = Column(JSON, default=dict)  # Renamed from metadata to avoid SQLAlchemy conflict
+    # Rarely read JSON payloads are deferred so plain loads skip decoding them
+    additional_info = deferred(Column(JSON, default=dict))  # Renamed from metadata to avoid SQLAlchemy conflict
     
-    turns = relationship("Turn", back_populates="interview")
+    turns = relationship("Turn", back_populates="interview", order_by="Turn.turn_number")
     
 class Turn(Base):
     __tablename__ = "turns"
@@ -27,7 +32,7 @@ class Turn(Base):
     id = Column(Integer, primary_key=True, index=True)
     interview_id = Column(Integer, ForeignKey("interviews.id"))
     turn_number = Column(Integer)
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, default=utcnow)
     
     question = Column(Text)
     answer = Column(Text)
@@ -38,11 +43,16 @@ class Turn(Base):
     rule_score = Column(Float, nullable=True)
     llm_score = Column(Float, nullable=True)
     hybrid_score = Column(Float, nullable=True)
-    error_tags = Column(JSON, default=list)
+    error_tags = deferred(Column(JSON, default=list))  # undefer when reading turns in bulk
     feedback = Column(Text, nullable=True)
     confidence = Column(Float, nullable=True)
     
     interview = relationship("Interview", back_populates="turns")
+    
+    # Latest-turn lookups per interview become an index scan instead of a sort
+    __table_args__ = (
+        Index("ix_turn_interview_turnnum", interview_id, turn_number.desc()),
+    )
 
 class Rubric(Base):
     __tablename__ = "rubrics"
@@ -54,7 +64,7 @@ class Rubric(Base):
     difficulty_tier = Column(Integer)  # 1=basic, 2=intermediate, 3=advanced
     
     rubric_data = Column(JSON)  # Detailed scoring criteria
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=utcnow)
 
 class Question(Base):
     __tablename__ = "questions"
@@ -65,5 +75,10 @@ class Question(Base):
     difficulty = Column(Integer)
     question_text = Column(Text)
     expected_answer = Column(Text)
-    validation_rules = Column(JSON, default=list)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    validation_rules = deferred(Column(JSON, default=list))
+    created_at = Column(DateTime, default=utcnow)
+    
+    # Question lookups always filter on skill, usually with difficulty
+    __table_args__ = (
+        Index("ix_question_skill_difficulty", skill, difficulty),
+    )
@@ -1,18 +1,75 @@
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from sqlalchemy import String, case, func, select, type_coerce
+from sqlalchemy.engine import Row
 from sqlalchemy.orm import Session
-from datetime import datetime
-import statistics
+from collections import OrderedDict
+from dataclasses import dataclass
+from weakref import WeakKeyDictionary
+import asyncio
+import bisect
+import copy
+import hashlib
 import json
+import re
 
 from storage.db import InterviewRepository, Turn, Interview
+from storage.models import utcnow
 from llm.provider_abstraction import provider_manager
 
+# orjson is optional; fall back to the stdlib encoder when it isn't installed
+try:
+    import orjson
+    
+    def _json_indented(value: Any) -> str:
+        return orjson.dumps(value, option=orjson.OPT_INDENT_2).decode()
+except ImportError:
+    def _json_indented(value: Any) -> str:
+        return json.dumps(value, indent=2)
+
+# Rows fetched per round trip when streaming turns
+TURN_BATCH_SIZE = 500
+
+# Built reports, one cache per database (the engine or connection a session is bound to)
+# since interview ids are only unique within one. Entries are keyed by (interview_id,
+# turn fingerprint), so a changed turn changes the key
+_REPORT_CACHE_SIZE = 512
+_report_caches: "WeakKeyDictionary[Any, OrderedDict[tuple, tuple]]" = WeakKeyDictionary()
+
+@dataclass(slots=True)
+class TurnStats:
+    """Interview-wide turn aggregates, computed in SQL"""
+    total_turns: int
+    covered_skills: int  # distinct target skills that belong to a category
+    avg_confidence: Optional[float]  # None when no turn has a confidence
+
+def _more_words_than(text: str, limit: int) -> bool:
+    """len(text.split()) > limit, without splitting the whole text"""
+    # limit + 1 words need at least 2 * limit + 1 characters
+    if len(text) <= 2 * limit:
+        return False
+    # At most limit + 1 pieces; the last one is the unsplit remainder
+    return len(text.split(None, limit)) > limit
+
 class ReportGenerator:
     """
     Generate comprehensive interview summary reports with scores,
     strengths, gaps, and actionable recommendations.
     """
     
+    ANALYSIS_INSTRUCTIONS = """
+
+Write a comprehensive 300-400 word analysis covering:
+1. Overall performance assessment
+2. Technical skill evaluation
+3. Reasoning and problem-solving approach
+4. Readiness for Excel-dependent roles
+5. Specific next steps for improvement
+
+Write in professional but encouraging tone suitable for candidate feedback."""
+    
+    # An "=" or a function name anywhere in the answer (substring match, so SUMIF/COUNTIF count)
+    _FORMULA_RE = re.compile(r"=|SUM|VLOOKUP|IF|INDEX", re.IGNORECASE)
+    
     def __init__(self, db: Session):
         self.db = db
         self.repo = InterviewRepository(db)
@@ -52,6 +109,19 @@ class ReportGenerator:
             (60, 69): {"level": "Basic", "description": "Fundamental skills present, needs development"},
             (0, 59): {"level": "Novice", "description": "Requires significant Excel training"}
         }
+        
+        # Band upper bounds in ascending order for bisect; a score belongs to the first
+        # band whose upper bound it doesn't exceed, so fractional scores like 89.5 land too
+        bands = sorted(self.performance_bands.items(), key=lambda band: band[0][1])
+        self._band_floor = bands[0][0][0]
+        self._band_uppers = [max_score for (_, max_score), _ in bands]
+        self._band_levels = [level_info for _, level_info in bands]
+        
+        # Summed in category order, like the weighted scores it divides
+        self._weight_total = sum(info["weight"] for info in self.skill_categories.values())
+        self._all_skills = frozenset(
+            skill for info in self.skill_categories.values() for skill in info["skills"]
+        )
     
     def generate_report(self, interview_id: int) -> Dict[str, Any]:
         """Generate comprehensive interview report"""
@@ -59,32 +129,68 @@ class ReportGenerator:
         if not interview:
             raise ValueError("Interview not found")
         
+        # Reports are rebuilt only when the turns have changed since the last one
+        report_cache = _report_caches.setdefault(self.db.get_bind(), OrderedDict())
+        cache_key = (interview_id, self._turn_fingerprint(interview_id))
+        cached = report_cache.get(cache_key)
+        if cached is None:
+            cached = self._build_report(interview_id)
+            report_cache[cache_key] = cached
+            if len(report_cache) > _REPORT_CACHE_SIZE:
+                report_cache.popitem(last=False)
+        else:
+            report_cache.move_to_end(cache_key)
+        total_score, report_body, interview_metadata = copy.deepcopy(cached)
+        
+        # Update interview with final score
+        self.repo.update_interview(interview_id, total_score=total_score, end_time=utcnow())
+        
+        return {
+            "interview_id": interview_id,
+            "candidate_name": interview.candidate_name,
+            **report_body,
+            "interview_metadata": {
+                "duration_minutes": self._calculate_duration(interview),
+                **interview_metadata
+            }
+        }
+    
+    def _turn_fingerprint(self, interview_id: int) -> str:
+        """Digest of every turn column a report reads, so it changes whenever a turn is
+        added, answered, regraded or edited"""
+        digest = hashlib.blake2b(digest_size=16)
+        # error_tags as its stored JSON text; there is no need to decode it here
+        columns = (Turn.id, Turn.question, Turn.answer, Turn.target_skill, Turn.hybrid_score,
+                   Turn.confidence, type_coerce(Turn.error_tags, String))
+        for row in self._iter_turn_rows(interview_id, columns):
+            digest.update(repr(tuple(row)).encode())
+        return digest.hexdigest()
+    
+    def _build_report(self, interview_id: int) -> Tuple[float, Dict[str, Any], Dict[str, Any]]:
+        """Everything in a report that depends only on the turns.
+        
+        Returns the unrounded total score, the report body and the turn metadata.
+        """
+        turn_stats = self._load_turn_stats(interview_id)
+        
         # Calculate scores by skill and category
-        scores_by_skill = self._calculate_skill_scores(interview)
-        scores_by_category = self._calculate_category_scores(scores_by_skill)
-        total_score = self._calculate_total_score(scores_by_category)
+        scores_by_skill, scores_by_category, total_score = self._calculate_scores(interview_id)
         
         # Analyze performance patterns
-        strengths = self._identify_strengths(scores_by_skill, scores_by_category)
-        gaps = self._identify_gaps(scores_by_skill, scores_by_category) 
+        strengths, gaps = self._analyze_scores(scores_by_skill, scores_by_category)
         
         # Generate recommendations
         recommendations = self._generate_recommendations(
-            total_score, scores_by_category, gaps, interview
+            total_score, scores_by_category, gaps, turn_stats
         )
         
         # Extract meaningful transcript excerpts
-        transcript_excerpts = self._extract_transcript_excerpts(interview)
+        transcript_excerpts = self._extract_transcript_excerpts(interview_id)
         
         # Determine performance level
         performance_level = self._get_performance_level(total_score)
         
-        # Update interview with final score
-        self.repo.update_interview(interview_id, total_score=total_score, end_time=datetime.utcnow())
-        
-        return {
-            "interview_id": interview_id,
-            "candidate_name": interview.candidate_name,
+        report_body = {
             "total_score": round(total_score, 1),
             "performance_level": performance_level,
             "scores_by_skill": scores_by_skill,
@@ -92,98 +198,80 @@ class ReportGenerator:
             "strengths": strengths,
             "gaps": gaps,
             "recommendations": recommendations,
-            "transcript_excerpts": transcript_excerpts,
-            "interview_metadata": {
-                "duration_minutes": self._calculate_duration(interview),
-                "total_turns": len(interview.turns),
-                "coverage_completeness": self._calculate_coverage_completeness(interview),
-                "grading_confidence": self._calculate_avg_confidence(interview)
-            }
+            "transcript_excerpts": transcript_excerpts
+        }
+        interview_metadata = {
+            "total_turns": turn_stats.total_turns,
+            "coverage_completeness": self._calculate_coverage_completeness(turn_stats),
+            "grading_confidence": self._calculate_avg_confidence(turn_stats)
         }
+        return total_score, report_body, interview_metadata
     
-    def _calculate_skill_scores(self, interview: Interview) -> Dict[str, float]:
-        """Calculate scores for each individual skill"""
-        skill_scores = {}
-        
-        for turn in interview.turns:
-            if turn.target_skill and turn.hybrid_score is not None:
-                skill = turn.target_skill
-                score = turn.hybrid_score
-                
-                # Take the best score for each skill (allows improvement)
-                if skill in skill_scores:
-                    skill_scores[skill] = max(skill_scores[skill], score)
-                else:
-                    skill_scores[skill] = score
-        
-        return skill_scores
+    def _load_turn_stats(self, interview_id: int) -> TurnStats:
+        """Turn count, distinct skills covered and average confidence in one query"""
+        # Only category skills count towards coverage, not "introduction" or ad-hoc skills
+        known_skill = case((Turn.target_skill.in_(self._all_skills), Turn.target_skill))
+        total_turns, covered_skills, avg_confidence = self.db.query(
+            func.count(Turn.id),
+            func.count(func.distinct(known_skill)),
+            # Rounded so an average of confidences that are all 0.7 comes back as 0.7,
+            # not an ulp below it
+            func.round(func.avg(Turn.confidence), 6)
+        ).filter(Turn.interview_id == interview_id).one()
+        return TurnStats(total_turns, covered_skills, avg_confidence)
     
-    def _calculate_category_scores(self, scores_by_skill: Dict[str, float]) -> Dict[str, float]:
-        """Calculate weighted scores for each skill category"""
-        category_scores = {}
-        
+    def _calculate_scores(self, interview_id: int
+                          ) -> Tuple[Dict[str, float], Dict[str, float], float]:
+        """Best score per skill (allows improvement), mean per category and weighted total"""
+        # The database reduces turns to one best score per skill, in first-asked order
+        rows = self.db.query(Turn.target_skill, func.max(Turn.hybrid_score)).filter(
+            Turn.interview_id == interview_id,
+            Turn.target_skill.isnot(None),
+            Turn.target_skill != "",
+            Turn.hybrid_score.isnot(None)
+        ).group_by(Turn.target_skill).order_by(func.min(Turn.turn_number)).all()
+        
+        # Rows arrive in first-asked order, which is the order skills are reported in
+        scores_by_skill = {skill: float(score) for skill, score in rows}
+        
+        # Every category carries its weight, covered or not; categories with no coverage
+        # score 0. Skills outside every category (e.g. "introduction") feed none of them
+        scores_by_category = {}
+        weighted_sum = 0.0
         for category, info in self.skill_categories.items():
-            category_skills = info["skills"]
-            relevant_scores = [scores_by_skill.get(skill, 0) for skill in category_skills 
-                             if skill in scores_by_skill]
-            
-            if relevant_scores:
-                # Use weighted average of actual scores
-                category_scores[category] = statistics.mean(relevant_scores)
-            else:
-                # No coverage in this category
-                category_scores[category] = 0
-        
-        return category_scores
-    
-    def _calculate_total_score(self, scores_by_category: Dict[str, float]) -> float:
-        """Calculate weighted total score across all categories"""
-        weighted_sum = 0
-        total_weight = 0
+            covered = [scores_by_skill[skill] for skill in info["skills"] if skill in scores_by_skill]
+            scores_by_category[category] = sum(covered) / len(covered) if covered else 0
+            weighted_sum += scores_by_category[category] * info["weight"]
         
-        for category, score in scores_by_category.items():
-            weight = self.skill_categories[category]["weight"]
-            weighted_sum += score * weight
-            total_weight += weight
-        
-        return weighted_sum / total_weight if total_weight > 0 else 0
+        total_score = weighted_sum / self._weight_total if self._weight_total > 0 else 0.0
+        return scores_by_skill, scores_by_category, total_score
     
-    def _identify_strengths(self, scores_by_skill: Dict[str, float], 
-                          scores_by_category: Dict[str, float]) -> List[str]:
-        """Identify candidate's strongest areas"""
+    def _analyze_scores(self, scores_by_skill: Dict[str, float],
+                        scores_by_category: Dict[str, float]) -> Tuple[List[str], List[str]]:
+        """Identify the candidate's strongest areas and the areas needing improvement.
+        
+        Returns (strengths, gaps), at most five of each.
+        """
         strengths = []
+        gaps = []
         
-        # High-scoring categories
+        # High- and low-scoring categories
         for category, score in scores_by_category.items():
             if score >= 80:
                 description = self.skill_categories[category]["description"]
                 strengths.append(f"Strong {description.lower()} (Score: {score:.0f})")
+            elif score < 60:
+                description = self.skill_categories[category]["description"]
+                gaps.append(f"Needs development in {description.lower()} (Score: {score:.0f})")
         
         # Exceptional individual skills
+        consistent_skills = 0
         for skill, score in scores_by_skill.items():
-            if score >= 85:
-                skill_name = skill.replace("_", " ").title()
-                strengths.append(f"Excellent {skill_name} knowledge (Score: {score:.0f})")
-        
-        # Pattern-based strengths
-        if scores_by_category.get("functions", 0) >= 75:
-            strengths.append("Demonstrates solid understanding of Excel formulas")
-        
-        if len([s for s in scores_by_skill.values() if s >= 70]) >= 5:
-            strengths.append("Consistent performance across multiple skill areas")
-        
-        return strengths[:5]  # Limit to top 5 strengths
-    
-    def _identify_gaps(self, scores_by_skill: Dict[str, float], 
-                      scores_by_category: Dict[str, float]) -> List[str]:
-        """Identify areas needing improvement"""
-        gaps = []
-        
-        # Low-scoring categories
-        for category, score in scores_by_category.items():
-            if score < 60:
-                description = self.skill_categories[category]["description"]
-                gaps.append(f"Needs development in {description.lower()} (Score: {score:.0f})")
+            if score >= 70:
+                consistent_skills += 1
+                if score >= 85:
+                    skill_name = skill.replace("_", " ").title()
+                    strengths.append(f"Excellent {skill_name} knowledge (Score: {score:.0f})")
         
         # Missing or weak individual skills
         critical_skills = ["vlookup", "if_functions", "pivot_tables"]
@@ -196,14 +284,20 @@ class ReportGenerator:
                 else:
                     gaps.append(f"Weak {skill_name} understanding (Score: {score:.0f})")
         
-        # Pattern-based gaps
+        # Pattern-based strengths and gaps
+        if scores_by_category.get("functions", 0) >= 75:
+            strengths.append("Demonstrates solid understanding of Excel formulas")
+        
+        if consistent_skills >= 5:
+            strengths.append("Consistent performance across multiple skill areas")
+        
         if scores_by_category.get("analysis", 0) < 50:
             gaps.append("Limited analytical and problem-solving capabilities")
         
-        return gaps[:5]  # Limit to top 5 gaps
+        return strengths[:5], gaps[:5]  # Limit to top 5 of each
     
     def _generate_recommendations(self, total_score: float, scores_by_category: Dict[str, float],
-                                gaps: List[str], interview: Interview) -> List[str]:
+                                gaps: List[str], turn_stats: TurnStats) -> List[str]:
         """Generate actionable improvement recommendations"""
         recommendations = []
         
@@ -233,9 +327,8 @@ class ReportGenerator:
             recommendations.append("Develop analytical thinking with what-if analysis and goal seek")
         
         # Performance-specific recommendations
-        confidence_scores = [turn.confidence for turn in interview.turns 
-                           if turn.confidence is not None]
-        if confidence_scores and statistics.mean(confidence_scores) < 0.7:
+        avg_confidence = turn_stats.avg_confidence
+        if avg_confidence is not None and avg_confidence < 0.7:
             recommendations.append("Build confidence through regular practice with varied Excel scenarios")
         
         # Generic helpful recommendations
@@ -246,15 +339,41 @@ class ReportGenerator:
         
         return recommendations[:6]  # Limit to top 6 recommendations
     
-    def _extract_transcript_excerpts(self, interview: Interview) -> List[Dict[str, str]]:
+    def _iter_turn_rows(self, interview_id: int, columns: Tuple, *criteria,
+                        batch_size: int = TURN_BATCH_SIZE) -> Iterator[Row]:
+        """Stream the given turn columns in turn order, batch_size rows at a time.
+        
+        Callers that stop early never fetch or build the remaining rows.
+        """
+        result = self.db.execute(
+            select(*columns)
+            .where(Turn.interview_id == interview_id, *criteria)
+            .order_by(Turn.turn_number)
+            .execution_options(yield_per=batch_size)
+        )
+        try:
+            for partition in result.partitions():
+                yield from partition
+        finally:
+            result.close()
+    
+    def _extract_transcript_excerpts(self, interview_id: int) -> List[Dict[str, str]]:
         """Extract meaningful excerpts from the interview transcript"""
         excerpts = []
         
+        # Only answered turns, and only the columns an excerpt needs
+        answered_turns = self._iter_turn_rows(
+            interview_id,
+            (Turn.question, Turn.answer, Turn.target_skill, Turn.hybrid_score, Turn.error_tags),
+            Turn.answer.isnot(None),
+            Turn.answer != ""
+        )
+        
         # Find turns with interesting patterns
-        for turn in interview.turns:
-            if not turn.answer:
-                continue
-                
+        for turn in answered_turns:
+            if len(excerpts) >= 4:
+                break
+            
             excerpt_reasons = []
             
             # High-scoring answers
@@ -266,15 +385,14 @@ class ReportGenerator:
                 excerpt_reasons.append("Learning opportunity")
             
             # Long, detailed answers
-            if len(turn.answer.split()) > 50:
+            if _more_words_than(turn.answer, 50):
                 excerpt_reasons.append("Detailed explanation")
             
             # Answers containing formulas
-            if "=" in turn.answer or any(func in turn.answer.upper() 
-                                       for func in ["SUM", "VLOOKUP", "IF", "INDEX"]):
+            if self._FORMULA_RE.search(turn.answer):
                 excerpt_reasons.append("Technical demonstration")
             
-            if excerpt_reasons and len(excerpts) < 4:
+            if excerpt_reasons:
                 excerpts.append({
                     "question": turn.question[:100] + "..." if len(turn.question) > 100 else turn.question,
                     "answer": turn.answer[:200] + "..." if len(turn.answer) > 200 else turn.answer,
@@ -287,9 +405,8 @@ class ReportGenerator:
     
     def _get_performance_level(self, total_score: float) -> Dict[str, str]:
         """Get performance level based on total score"""
-        for (min_score, max_score), level_info in self.performance_bands.items():
-            if min_score <= total_score <= max_score:
-                return level_info
+        if self._band_floor <= total_score <= self._band_uppers[-1]:
+            return self._band_levels[bisect.bisect_left(self._band_uppers, total_score)]
         
         return {"level": "Unknown", "description": "Unable to determine performance level"}
     
@@ -300,54 +417,44 @@ class ReportGenerator:
             return int(duration.total_seconds() / 60)
         return 0
     
-    def _calculate_coverage_completeness(self, interview: Interview) -> float:
+    def _calculate_coverage_completeness(self, turn_stats: TurnStats) -> float:
         """Calculate what percentage of skills were covered"""
-        all_skills = []
-        for category_info in self.skill_categories.values():
-            all_skills.extend(category_info["skills"])
-        
-        covered_skills = set(turn.target_skill for turn in interview.turns if turn.target_skill)
-        coverage = len(covered_skills) / len(all_skills) * 100
+        coverage = turn_stats.covered_skills / len(self._all_skills) * 100
         return round(coverage, 1)
     
-    def _calculate_avg_confidence(self, interview: Interview) -> float:
+    def _calculate_avg_confidence(self, turn_stats: TurnStats) -> float:
         """Calculate average grading confidence"""
-        confidences = [turn.confidence for turn in interview.turns 
-                      if turn.confidence is not None]
-        if confidences:
-            return round(statistics.mean(confidences) * 100, 1)
-        return 50.0
+        if turn_stats.avg_confidence is None:
+            return 50.0
+        return round(turn_stats.avg_confidence * 100, 1)
     
-    async def generate_detailed_analysis(self, interview_id: int) -> str:
-        """Generate detailed narrative analysis using LLM"""
-        basic_report = self.generate_report(interview_id)
-        
-        analysis_prompt = f"""Generate a detailed narrative analysis of this Excel interview performance:
-
-CANDIDATE: {basic_report.get('candidate_name', 'Anonymous')}
-TOTAL SCORE: {basic_report['total_score']}/100
-PERFORMANCE LEVEL: {basic_report['performance_level']['level']}
-
-CATEGORY SCORES:
-{json.dumps(basic_report['scores_by_category'], indent=2)}
-
-STRENGTHS:
-{chr(10).join(f"- {s}" for s in basic_report['strengths'])}
-
-GAPS:
-{chr(10).join(f"- {g}" for g in basic_report['gaps'])}
-
-SAMPLE RESPONSES:
-{json.dumps(basic_report['transcript_excerpts'], indent=2)}
-
-Write a comprehensive 300-400 word analysis covering:
-1. Overall performance assessment
-2. Technical skill evaluation
-3. Reasoning and problem-solving approach
-4. Readiness for Excel-dependent roles
-5. Specific next steps for improvement
-
-Write in professional but encouraging tone suitable for candidate feedback."""
+    async def generate_detailed_analysis(self, interview_id: int,
+                                         basic_report: Optional[Dict[str, Any]] = None) -> str:
+        """Generate detailed narrative analysis using LLM.
+        
+        Pass basic_report when the caller already has the generate_report output.
+        """
+        if basic_report is None:
+            # The report queries are synchronous; keep them off the event loop
+            basic_report = await asyncio.to_thread(self.generate_report, interview_id)
+        
+        # Assembled once from pieces rather than as nested f-strings and joins
+        parts = [
+            "Generate a detailed narrative analysis of this Excel interview performance:\n\n",
+            f"CANDIDATE: {basic_report.get('candidate_name', 'Anonymous')}\n",
+            f"TOTAL SCORE: {basic_report['total_score']}/100\n",
+            f"PERFORMANCE LEVEL: {basic_report['performance_level']['level']}\n\n",
+            "CATEGORY SCORES:\n",
+            _json_indented(basic_report['scores_by_category']),
+            "\n\nSTRENGTHS:\n",
+            "\n".join([f"- {s}" for s in basic_report['strengths']]),
+            "\n\nGAPS:\n",
+            "\n".join([f"- {g}" for g in basic_report['gaps']]),
+            "\n\nSAMPLE RESPONSES:\n",
+            _json_indented(basic_report['transcript_excerpts']),
+            self.ANALYSIS_INSTRUCTIONS
+        ]
+        analysis_prompt = "".join(parts)
         
         try:
             detailed_analysis = await provider_manager.generate_summary(analysis_prompt, temperature=0.4)
@@ -0,0 +1,16 @@
+"""
+Lightweight stand-ins for question and response objects in tests
+"""
+from dataclasses import dataclass
+
+@dataclass(slots=True)
+class FakeQuestion:
+    id: int
+    skill: str
+    difficulty: int
+    question_text: str = ""
+
+@dataclass(slots=True)
+class FakeResponse:
+    score: float
+    question: FakeQuestion
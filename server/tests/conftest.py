@@ -1,22 +1,48 @@
 # Test Configuration
 import os
 import sys
+import json
 import pytest
+import httpx
+from types import SimpleNamespace
 from fastapi.testclient import TestClient
 
 # Add the server directory to the path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from main import app
-from storage.db import get_db, create_tables
-from storage.models import Base
-from sqlalchemy import create_engine
+from config import settings
+from storage.db import get_db
+from storage.models import Base, Interview, Turn
+from sqlalchemy import create_engine, event, insert
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 
-# Test database configuration
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Test database configuration: one in-memory database shared by every connection
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool
+)
+
+# pysqlite manages transactions itself and breaks SAVEPOINT; let SQLAlchemy emit BEGIN
+@event.listens_for(engine, "connect")
+def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+    dbapi_connection.isolation_level = None
+
+@event.listens_for(engine, "begin")
+def _begin_transaction(connection):
+    connection.exec_driver_sql("BEGIN")
+
+# Tables are created once; each test's writes are rolled back instead
+Base.metadata.create_all(bind=engine)
+
+# Sessions join the per-test transaction, so an app-side commit only releases a savepoint
+TestingSessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, expire_on_commit=False,
+    join_transaction_mode="create_savepoint"
+)
 
 def override_get_db():
     try:
@@ -27,40 +53,126 @@ def override_get_db():
 
 app.dependency_overrides[get_db] = override_get_db
 
-@pytest.fixture(scope="session")
+@pytest.fixture(autouse=True)
+def db_connection():
+    """Run each test inside a transaction that is rolled back afterwards"""
+    connection = engine.connect()
+    transaction = connection.begin()
+    TestingSessionLocal.configure(bind=connection)
+    try:
+        yield connection
+    finally:
+        transaction.rollback()
+        connection.close()
+
+@pytest.fixture(scope="module")
 def test_client():
     """Create a test client for the FastAPI app"""
-    # Create test database tables
-    Base.metadata.create_all(bind=engine)
-    
     with TestClient(app) as client:
         yield client
-    
-    # Clean up
-    Base.metadata.drop_all(bind=engine)
-    if os.path.exists("test.db"):
-        os.remove("test.db")
 
-@pytest.fixture(scope="session")
-def test_db():
+@pytest.fixture
+def test_db(db_connection):
     """Create a test database session"""
-    Base.metadata.create_all(bind=engine)
     db = TestingSessionLocal()
     try:
         yield db
     finally:
         db.close()
-        Base.metadata.drop_all(bind=engine)
 
-@pytest.fixture(autouse=True)
-def mock_env_vars(monkeypatch):
-    """Mock environment variables for testing"""
-    monkeypatch.setenv("GEMINI_API_KEY", "test_gemini_key")
-    monkeypatch.setenv("GROQ_API_KEY", "test_groq_key")
-    monkeypatch.setenv("ANTHROPIC_API_KEY", "test_anthropic_key")
-    monkeypatch.setenv("PRIMARY_LLM_PROVIDER", "gemini")
-    monkeypatch.setenv("MOCK_LLM_RESPONSES", "true")
-    monkeypatch.setenv("DEBUG", "true")
+TEST_ENV_VARS = {
+    "GEMINI_API_KEY": "test_gemini_key",
+    "GROQ_API_KEY": "test_groq_key",
+    "ANTHROPIC_API_KEY": "test_anthropic_key",
+    "PRIMARY_LLM_PROVIDER": "gemini",
+    "MOCK_LLM_RESPONSES": "true",
+    "DEBUG": "true"
+}
+
+@pytest.fixture(scope="session", autouse=True)
+def mock_env_vars():
+    """Mock environment variables for testing; set once, tests can still override via monkeypatch"""
+    with pytest.MonkeyPatch.context() as mp:
+        for name, value in TEST_ENV_VARS.items():
+            mp.setenv(name, value)
+        settings.cache_clear()  # Re-read the environment on the next settings() call
+        yield
+    settings.cache_clear()
+
+@pytest.fixture
+def env(monkeypatch):
+    """Set environment variables for one test and have settings() pick them up"""
+    def setenv(**values):
+        for name, value in values.items():
+            monkeypatch.setenv(name, value)
+        settings.cache_clear()
+    yield setenv
+    monkeypatch.undo()
+    settings.cache_clear()
+
+@pytest.fixture(scope="session")
+def clients():
+    """One client per provider, built once; construction configures the SDKs"""
+    from llm.gemini import GeminiClient
+    from llm.groq import GroqClient
+    from llm.claude import ClaudeClient
+
+    return {
+        "gemini": GeminiClient("test-key", "gemini-2.0-flash-exp"),
+        "groq": GroqClient("test-key", "llama-3.1-70b-versatile"),
+        "claude": ClaudeClient("test-key", "claude-3-5-sonnet-20241022")
+    }
+
+CASSETTE_DIR = os.path.join(os.path.dirname(__file__), "cassettes")
+
+@pytest.fixture(scope="session")
+def cassettes():
+    """Canned provider responses, keyed by provider then prompt"""
+    with open(os.path.join(CASSETTE_DIR, "generate.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+@pytest.fixture
+def replay(cassettes, monkeypatch):
+    """Wire a provider client to answer from tests/cassettes instead of the network"""
+    from llm.gemini import GeminiClient
+    from llm.groq import GroqClient
+    from llm.claude import ClaudeClient
+
+    def lookup(provider, prompt):
+        try:
+            return cassettes[provider][prompt]
+        except KeyError:
+            pytest.fail(f"No {provider} cassette for prompt {prompt!r}; add it to {CASSETTE_DIR}")
+
+    def groq_handler(request):
+        body = json.loads(request.content)
+        text = lookup("groq", body["messages"][-1]["content"])
+        return httpx.Response(200, json={
+            "choices": [{"message": {"role": "assistant", "content": text}}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        })
+
+    async def claude_create(**request):
+        text = lookup("claude", request["messages"][-1]["content"])
+        return SimpleNamespace(content=[SimpleNamespace(type="text", text=text)],
+                               usage=SimpleNamespace(input_tokens=0, output_tokens=0))
+
+    def install(client):
+        if isinstance(client, GeminiClient):
+            monkeypatch.setattr(client.model, "generate_content", lambda prompt, **kwargs: SimpleNamespace(
+                text=lookup("gemini", prompt), usage_metadata=None
+            ))
+        elif isinstance(client, GroqClient):
+            monkeypatch.setattr(client, "_http_client",
+                                httpx.AsyncClient(transport=httpx.MockTransport(groq_handler)))
+        elif isinstance(client, ClaudeClient):
+            # The Anthropic SDK brings its own HTTP stack, so replay at the Messages API
+            monkeypatch.setattr(client.client.messages, "create", claude_create)
+        else:
+            raise TypeError(f"No replay wiring for {type(client).__name__}")
+        return client
+
+    return install
 
 # Test data fixtures
 @pytest.fixture
@@ -89,3 +201,30 @@ def sample_response_data():
         "score": 85.0,
         "feedback": "Good use of VLOOKUP with exact match."
     }
+
+@pytest.fixture
+def preloaded_interview(test_db):
+    """Interview with five graded turns seeded directly, for tests that only read it back"""
+    interview_id = test_db.execute(
+        insert(Interview).values(candidate_name="Preloaded Candidate", state="WRAP")
+    ).inserted_primary_key[0]
+    
+    test_db.execute(insert(Turn), [
+        {"interview_id": interview_id, "turn_number": number, "question": question,
+         "answer": answer, "target_skill": skill, "difficulty": 1,
+         "hybrid_score": score, "confidence": 0.8}
+        for number, (skill, question, answer, score) in enumerate([
+            ("introduction", "Tell me about your Excel experience.",
+             "I use Excel daily for reporting.", None),
+            ("references", "What is the difference between A1 and $A$1?",
+             "A1 is relative, $A$1 is absolute reference.", 75.0),
+            ("vlookup", "How would you look up a product name by ID?",
+             "=VLOOKUP(A2, Products!A:B, 2, FALSE)", 82.0),
+            ("if_functions", "Flag orders over 100 as High.",
+             "=IF(B2>100, \"High\", \"Low\")", 90.0),
+            ("pivot_tables", "How would you summarise sales by region?",
+             "I would create a pivot table with Region as rows.", 55.0)
+        ], start=1)
+    ])
+    test_db.commit()
+    return interview_id
@@ -96,6 +96,19 @@ class TestInterviewFlow:
         assert "skill_scores" in summary_data
         assert "feedback" in summary_data
         assert "recommendations" in summary_data
+    
+    def test_summary_for_preloaded_interview(self, test_client, preloaded_interview):
+        """Test the summary report for an interview seeded straight into the database"""
+        response = test_client.get(f"/summary/{preloaded_interview}")
+        assert response.status_code == status.HTTP_200_OK
+        
+        summary_data = response.json()
+        assert summary_data["interview_id"] == preloaded_interview
+        assert summary_data["scores_by_skill"] == {
+            "references": 75.0, "vlookup": 82.0, "if_functions": 90.0, "pivot_tables": 55.0
+        }
+        assert "Weak Pivot Tables understanding (Score: 55)" in summary_data["gaps"]
+        assert len(summary_data["transcript_excerpts"]) <= 4
 
 class TestAPIValidation:
     """Test API input validation"""
@@ -10,7 +10,8 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from agents.interviewer import InterviewAgent, InterviewState
-from storage.models import Interview, Question, Response
+from storage.models import Interview, Question
+from tests._fakes import FakeQuestion, FakeResponse
 
 class TestInterviewAgent:
     """Test interview agent functionality"""
@@ -72,9 +73,9 @@ class TestInterviewAgent:
         """Test question selection logic"""
         # Mock available questions
         mock_questions = [
-            Mock(id=1, skill="vlookup", difficulty=2),
-            Mock(id=2, skill="if_functions", difficulty=2),  
-            Mock(id=3, skill="pivot_tables", difficulty=3)
+            FakeQuestion(1, "vlookup", 2),
+            FakeQuestion(2, "if_functions", 2),  
+            FakeQuestion(3, "pivot_tables", 3)
         ]
         mock_get_questions.return_value = mock_questions
         
@@ -95,7 +96,7 @@ class TestInterviewAgent:
         assert len(self.agent.skill_coverage) > 0
         
         # Update coverage after question
-        mock_question = Mock(skill="vlookup")
+        mock_question = FakeQuestion(1, "vlookup", 2)
         self.agent._update_skill_coverage(mock_question, 85.0)
         assert self.agent.skill_coverage["vlookup"] > 0
     
@@ -103,9 +104,9 @@ class TestInterviewAgent:
         """Test candidate performance calculation"""
         # Add some mock responses
         mock_responses = [
-            Mock(score=85.0, question=Mock(skill="vlookup", difficulty=2)),
-            Mock(score=70.0, question=Mock(skill="if_functions", difficulty=1)),
-            Mock(score=90.0, question=Mock(skill="sumif", difficulty=2))
+            FakeResponse(85.0, FakeQuestion(1, "vlookup", 2)),
+            FakeResponse(70.0, FakeQuestion(2, "if_functions", 1)),
+            FakeResponse(90.0, FakeQuestion(3, "sumif", 2))
         ]
         
         self.agent.responses = mock_responses
@@ -144,12 +145,7 @@ class TestInterviewAgent:
             "method": "hybrid"
         }
         
-        mock_question = Mock(
-            id=1,
-            skill="vlookup", 
-            difficulty=2,
-            question_text="Test question"
-        )
+        mock_question = FakeQuestion(1, "vlookup", 2, "Test question")
         
         result = self.agent.process_response("=VLOOKUP(A1,B:C,2,FALSE)", mock_question)
         
@@ -170,9 +166,9 @@ class TestInterviewFlow:
         """Test interview path for novice candidate"""
         # Mock questions for novice level
         mock_questions = [
-            Mock(id=1, skill="references", difficulty=1, question_text="What is A1?"),
-            Mock(id=2, skill="basic_formulas", difficulty=1, question_text="How to sum?"),
-            Mock(id=3, skill="ranges", difficulty=1, question_text="What is A1:A10?")
+            FakeQuestion(1, "references", 1, "What is A1?"),
+            FakeQuestion(2, "basic_formulas", 1, "How to sum?"),
+            FakeQuestion(3, "ranges", 1, "What is A1:A10?")
         ]
         mock_question_selector.side_effect = mock_questions
         
@@ -210,10 +206,10 @@ class TestInterviewFlow:
         """Test interview path for advanced candidate"""
         # Mock questions progressing in difficulty
         mock_questions = [
-            Mock(id=1, skill="references", difficulty=1, question_text="References?"),
-            Mock(id=2, skill="vlookup", difficulty=2, question_text="VLOOKUP formula?"),
-            Mock(id=3, skill="index_match", difficulty=3, question_text="INDEX/MATCH vs VLOOKUP?"),
-            Mock(id=4, skill="case_analysis", difficulty=3, question_text="Complex scenario?")
+            FakeQuestion(1, "references", 1, "References?"),
+            FakeQuestion(2, "vlookup", 2, "VLOOKUP formula?"),
+            FakeQuestion(3, "index_match", 3, "INDEX/MATCH vs VLOOKUP?"),
+            FakeQuestion(4, "case_analysis", 3, "Complex scenario?")
         ]
         mock_question_selector.side_effect = mock_questions
         
@@ -311,7 +307,7 @@ class TestInterviewEdgeCases:
             # Simulate grading error
             mock_grader.side_effect = Exception("Grading service unavailable")
             
-            mock_question = Mock(id=1, skill="test", difficulty=1)
+            mock_question = FakeQuestion(1, "test", 1)
             
             # Should not crash, return default response
             result = self.agent.process_response("test answer", mock_question)
@@ -0,0 +1,48 @@
+"""
+Test interview summary reports
+"""
+import pytest
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import update
+
+from storage.models import Turn
+from summary.report import ReportGenerator
+
+class TestReportCache:
+    """Test that cached reports follow changes to the interview's turns"""
+
+    def _set_turn(self, db, interview_id, skill, **values):
+        db.execute(update(Turn).where(
+            Turn.interview_id == interview_id, Turn.target_skill == skill
+        ).values(**values))
+        db.commit()
+
+    def test_report_follows_regraded_turn(self, test_db, preloaded_interview):
+        """Test that regrading turns rebuilds the report even when the score total is unchanged"""
+        first = ReportGenerator(test_db).generate_report(preloaded_interview)
+        assert first["scores_by_skill"]["vlookup"] == 82.0
+
+        # Swap two scores: the turn count and the score sum stay the same
+        self._set_turn(test_db, preloaded_interview, "vlookup", hybrid_score=90.0)
+        self._set_turn(test_db, preloaded_interview, "if_functions", hybrid_score=82.0)
+        second = ReportGenerator(test_db).generate_report(preloaded_interview)
+
+        assert second["scores_by_skill"]["vlookup"] == 90.0
+        assert second["scores_by_skill"]["if_functions"] == 82.0
+
+    def test_report_follows_new_error_tags(self, test_db, preloaded_interview):
+        """Test that tagging an error on a turn shows up in the excerpts"""
+        generator = ReportGenerator(test_db)
+        before = generator.generate_report(preloaded_interview)
+
+        self._set_turn(test_db, preloaded_interview, "references", error_tags=["mixed_references"])
+        after = generator.generate_report(preloaded_interview)
+
+        reasons = [excerpt["reason"] for excerpt in after["transcript_excerpts"]]
+        assert len(after["transcript_excerpts"]) == len(before["transcript_excerpts"]) + 1
+        assert "Learning opportunity" in reasons
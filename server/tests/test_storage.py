@@ -0,0 +1,43 @@
+"""
+Test storage repositories
+"""
+import pytest
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from storage.db import QuestionRepository
+from storage.models import Base, Question
+
+class TestQuestionRepository:
+    """Test question lookups"""
+
+    def test_question_index_is_per_database(self, test_db):
+        """Test that a question id cached for one database is never served from another"""
+        QuestionRepository(test_db).create_question(
+            "vlookup", "functions", 2, "Look up a price by SKU.", "=VLOOKUP(A2, Prices!A:B, 2, FALSE)"
+        )
+        assert QuestionRepository(test_db).get_random_question("vlookup", 2) is not None
+
+        other_engine = create_engine("sqlite://", poolclass=StaticPool)
+        Base.metadata.create_all(bind=other_engine)
+        with Session(other_engine) as other_db:
+            # Seeded outside the repository, so nothing invalidates a cached index; the
+            # first id in this database belongs to a different skill
+            other_db.add_all([
+                Question(skill="pivot_tables", category="data_ops", difficulty=2,
+                         question_text="Summarise sales by region.", expected_answer=""),
+                Question(skill="vlookup", category="functions", difficulty=2,
+                         question_text="Find a product name.", expected_answer="")
+            ])
+            other_db.commit()
+
+            question = QuestionRepository(other_db).get_random_question("vlookup", 2)
+
+        assert question.question_text == "Find a product name."
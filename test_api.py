@@ -3,8 +3,10 @@
 Test script to verify API providers are working
 """
 import os
+import io
 import sys
 import asyncio
+from contextvars import ContextVar
 
 # Add server directory to path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'server'))
@@ -29,7 +31,8 @@ async def test_gemini():
         genai.configure(api_key=api_key)
         model = genai.GenerativeModel('gemini-2.0-flash-exp')
         
-        response = model.generate_content("Hello, respond with just 'Working'")
+        # The SDK call blocks; run it in a thread so the other checks keep going
+        response = await asyncio.to_thread(model.generate_content, "Hello, respond with just 'Working'")
         print(f"✅ Gemini response: {response.text}")
         return True
         
@@ -110,18 +113,54 @@ async def test_provider_manager():
         traceback.print_exc()
         return False
 
+# Output buffer of the check running in the current task (None = print directly)
+_task_output: ContextVar = ContextVar("_task_output", default=None)
+
+class _TaskStdout:
+    """Stdout proxy that sends each concurrent check's prints to its own buffer"""
+    
+    def __init__(self, stream):
+        self._stream = stream
+    
+    def write(self, text):
+        buffer = _task_output.get()
+        return (buffer if buffer is not None else self._stream).write(text)
+    
+    def flush(self):
+        self._stream.flush()
+
+async def _run_buffered(check):
+    """Run one check, returning its result and everything it printed"""
+    buffer = io.StringIO()
+    _task_output.set(buffer)  # Each gathered task has its own context copy
+    result = await check()
+    return result, buffer.getvalue()
+
 async def main():
     print("🧪 Testing AI Provider Configuration")
     print("=" * 50)
     
-    # Test individual providers
-    gemini_works = await test_gemini()
-    print()
-    groq_works = await test_groq()
-    print()
+    # The checks are independent network round-trips, so run them together
+    checks = (test_gemini, test_groq, test_provider_manager)
+    real_stdout = sys.stdout
+    sys.stdout = _TaskStdout(real_stdout)
+    try:
+        outcomes = await asyncio.gather(*(_run_buffered(check) for check in checks),
+                                        return_exceptions=True)
+    finally:
+        sys.stdout = real_stdout
     
-    # Test provider manager
-    manager_works = await test_provider_manager()
+    results = []
+    for check, outcome in zip(checks, outcomes):
+        if isinstance(outcome, BaseException):
+            print(f"❌ {check.__name__} crashed: {outcome}")
+            results.append(False)
+        else:
+            result, output = outcome
+            print(output, end="")
+            results.append(result)
+        print()
+    gemini_works, groq_works, manager_works = results
     
     print("\n" + "=" * 50)
     print("📋 Test Results:")
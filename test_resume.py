@@ -1,32 +1,67 @@
-import requests
+import asyncio
+import atexit
 import base64
-import json
+import sys
+import time
+import httpx
+
+BASE_URL = "http://127.0.0.1:8000"
+
+# One keep-alive connection pool for every request this script makes
+SESSION = httpx.Client(base_url=BASE_URL, timeout=30.0)
+atexit.register(SESSION.close)
+
+# Create a simple test PDF content (base64 encoded) once
+TEST_CONTENT = "Sample resume content for testing"
+TEST_B64 = base64.b64encode(TEST_CONTENT.encode()).decode()
+
+TEST_PAYLOAD = {
+    "filename": "test_resume.pdf",
+    "content": TEST_B64
+}
 
 # Test the resume upload endpoint
 def test_resume_upload():
-    url = "http://127.0.0.1:8000/api/upload-resume-simple"
-    
-    # Create a simple test PDF content (base64 encoded)
-    test_content = "Sample resume content for testing"
-    test_base64 = base64.b64encode(test_content.encode()).decode()
-    
-    payload = {
-        "filename": "test_resume.pdf",
-        "content": test_base64
-    }
-    
     try:
-        response = requests.post(url, json=payload)
+        response = SESSION.post("/api/upload-resume-simple", json=TEST_PAYLOAD)
         print(f"Status Code: {response.status_code}")
         print(f"Response: {response.text}")
-        
+
         if response.status_code == 200:
             print("✅ Resume upload endpoint is working!")
         else:
             print("❌ Resume upload endpoint has issues")
-            
+
     except Exception as e:
         print(f"❌ Error testing endpoint: {e}")
 
+async def test_bulk_upload(n=32, concurrency=8):
+    """Upload n resumes concurrently and report the endpoint's throughput"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(base_url=BASE_URL, timeout=30.0) as client:
+        async def upload(i):
+            async with semaphore:
+                return await client.post(
+                    "/api/upload-resume-simple",
+                    json={"filename": f"resume_{i}.pdf", "content": TEST_B64}
+                )
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(upload(i) for i in range(n)), return_exceptions=True)
+        elapsed = time.perf_counter() - started
+
+    succeeded = sum(1 for r in results if not isinstance(r, BaseException) and r.status_code == 200)
+    print(f"Bulk upload: {succeeded}/{n} succeeded in {elapsed:.2f}s ({n / elapsed:.1f} uploads/s)")
+
+    if succeeded == n:
+        print("✅ Resume upload endpoint handled concurrent uploads!")
+    else:
+        errors = {repr(r) if isinstance(r, BaseException) else r.status_code for r in results}
+        print(f"❌ {n - succeeded} uploads failed: {errors}")
+    return succeeded == n
+
 if __name__ == "__main__":
     test_resume_upload()
+    if "--bulk" in sys.argv:
+        asyncio.run(test_bulk_upload())
@@ -3,9 +3,11 @@ Quick validation script for Excel Interviewer system
 Tests basic functionality without full test suite
 """
 import asyncio
+import io
 import os
 import sys
 import json
+from contextvars import ContextVar
 from pathlib import Path
 
 # Add server path
@@ -13,23 +15,21 @@ server_path = Path(__file__).parent / "server"
 sys.path.insert(0, str(server_path))
 
 async def test_llm_providers():
-    """Test LLM provider abstraction"""
+    """Test LLM provider abstraction against the in-process mock client"""
     print("🔍 Testing LLM providers...")
     
     try:
-        # Test with mock keys - just verify the classes can be imported
-        os.environ['GOOGLE_API_KEY'] = 'test-key'
-        os.environ['GROQ_API_KEY'] = 'test-key'
-        os.environ['ANTHROPIC_API_KEY'] = 'test-key'
+        from llm.provider_abstraction import LLMProvider, BaseLLMClient, MockLLMClient
         
-        from llm.provider_abstraction import LLMProvider, GeminiProvider, GroqProvider, ClaudeProvider
+        print(f"  ✅ Providers available: {', '.join(p.value for p in LLMProvider)}")
         
-        print(f"  ✅ LLM provider base class imported successfully")
-        print(f"  ✅ Provider classes available: GeminiProvider, GroqProvider, ClaudeProvider")
+        # The mock client answers in-process: no provider SDK import, no network
+        client = MockLLMClient()
+        print(f"  ✅ Client implements required interface: {isinstance(client, BaseLLMClient)}")
         
-        # Test basic properties without external dependencies
-        base_provider = LLMProvider()
-        print(f"  ✅ Base provider has required interface: {hasattr(base_provider, 'generate')} {hasattr(base_provider, 'get_cost_estimate')}")
+        response = await client.generate("Grade this answer", json_mode=True)
+        json.loads(response.content)
+        print(f"  ✅ Mock generation returned JSON: {response.content[:40]}...")
         
         return True
         
@@ -37,38 +37,33 @@ async def test_llm_providers():
         print(f"  ❌ LLM provider test failed: {e}")
         return False
 
+# Grading fixture, built once per process
+_VLOOKUP_QUESTION = {
+    "question": "Write a VLOOKUP formula to find data",
+    "target_skill": "vlookup",
+    "difficulty": 2,
+    "expected_answer": "=VLOOKUP(lookup_value,table_array,col_index,FALSE)"
+}
+
+_TEST_RESPONSES = (
+    "=VLOOKUP(A1,B:C,2,FALSE)",
+    "=VLOOKUP(A1,B1:C10,2,0)",
+    "vlookup formula searches for values",
+    "I don't know"
+)
+
 def test_grading_system():
     """Test grading system components"""
     print("🔍 Testing grading system...")
     
     try:
         from graders.hybrid import HybridGrader
-        from graders.rule_based import RuleBasedGrader
-        from storage.models import Question
-        
-        # Create test question
-        question = Question(
-            id=1,
-            skill="vlookup",
-            difficulty=2,
-            question_text="Write a VLOOKUP formula to find data",
-            expected_answer="=VLOOKUP(lookup_value,table_array,col_index,FALSE)",
-            explanation="VLOOKUP searches vertically in a table"
-        )
-        
-        # Test rule-based grader
-        rule_grader = RuleBasedGrader()
-        
-        test_responses = [
-            "=VLOOKUP(A1,B:C,2,FALSE)",
-            "=VLOOKUP(A1,B1:C10,2,0)",
-            "vlookup formula searches for values",
-            "I don't know"
-        ]
+        from graders.rule_based import rule_grader
         
-        for response in test_responses:
-            result = rule_grader.grade_response(response, question)
-            print(f"  📝 Response: '{response[:30]}...' -> Score: {result['score']}")
+        # Test the shared rule-based grader; its patterns are compiled at class level
+        for response in _TEST_RESPONSES:
+            result = rule_grader.grade_answer(answer=response, **_VLOOKUP_QUESTION)
+            print(f"  📝 Response: '{response[:30]}...' -> Score: {result.score}")
         
         print("  ✅ Rule-based grading working")
         
@@ -116,83 +111,94 @@ def test_interview_agent():
         print(f"  ❌ Interview agent test failed: {e}")
         return False
 
+# In-memory database shared by every validation run in this process
+_ENGINE = None
+
+def _get_engine():
+    """Create the in-memory engine and its tables on first use"""
+    global _ENGINE
+    if _ENGINE is None:
+        from sqlalchemy import create_engine
+        from sqlalchemy.pool import StaticPool
+        from storage.models import Base
+        
+        # StaticPool keeps the single connection that holds the :memory: database
+        _ENGINE = create_engine(
+            "sqlite:///:memory:",
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool
+        )
+        Base.metadata.create_all(_ENGINE)
+    return _ENGINE
+
 def test_database_models():
     """Test database models and relationships"""
     print("🔍 Testing database models...")
     
     try:
-        from storage.models import Interview, Question, Response
-        from storage.database import get_db_engine
-        from sqlalchemy.orm import sessionmaker
-        import tempfile
-        
-        # Create temporary database
-        with tempfile.NamedTemporaryFile(suffix='.db', delete=False) as tmp:
-            test_db_path = tmp.name
-        
-        # Test database connection
-        engine = get_db_engine(f"sqlite:///{test_db_path}")
-        Session = sessionmaker(bind=engine)
-        session = Session()
-        
-        # Create tables
-        from storage.models import Base
-        Base.metadata.create_all(engine)
-        
-        # Test model creation
-        interview = Interview(
-            candidate_name="Test User",
-            status="in_progress"
-        )
-        session.add(interview)
-        session.commit()
-        
-        question = Question(
-            skill="test",
-            difficulty=1,
-            question_text="Test question",
-            expected_answer="Test answer",
-            explanation="Test explanation"
-        )
-        session.add(question)
-        session.commit()
-        
-        response = Response(
-            interview_id=interview.id,
-            question_id=question.id,
-            response_text="Test response",
-            score=85.0,
-            feedback="Good answer"
-        )
-        session.add(response)
-        session.commit()
-        
-        # Test relationships
-        assert len(interview.responses) == 1
-        assert response.interview.candidate_name == "Test User"
-        assert response.question.skill == "test"
+        from storage.models import Interview, Question, Turn
+        from sqlalchemy.orm import Session
+        
+        with Session(_get_engine()) as session:
+            # One transaction for all inserts
+            with session.begin():
+                interview = Interview(
+                    candidate_name="Test User",
+                    state="CORE_Q"
+                )
+                question = Question(
+                    skill="test",
+                    difficulty=1,
+                    question_text="Test question",
+                    expected_answer="Test answer"
+                )
+                turn = Turn(
+                    interview=interview,
+                    turn_number=1,
+                    question=question.question_text,
+                    answer="Test response",
+                    target_skill=question.skill,
+                    hybrid_score=85.0,
+                    feedback="Good answer"
+                )
+                session.add_all([interview, question, turn])
+            
+            # Test relationships
+            assert turn in interview.turns
+            assert turn.interview.candidate_name == "Test User"
+            assert turn.target_skill == "test"
         
         print("  ✅ Database models working")
-        
-        # Cleanup
-        session.close()
-        os.unlink(test_db_path)
-        
         return True
         
     except Exception as e:
         print(f"  ❌ Database models test failed: {e}")
         return False
 
+EXPECTED_ROUTES = frozenset({"/health", "/interviews", "/turn", "/summary/{interview_id}"})
+
+# App client and registered route paths, built on first use and reused afterwards
+_API_CLIENT = None
+_ROUTE_SET = frozenset()
+
+def _get_api_client():
+    """Create the TestClient and snapshot the app's route paths once"""
+    global _API_CLIENT, _ROUTE_SET
+    if _API_CLIENT is None:
+        from main import app
+        from fastapi.testclient import TestClient
+        
+        # Mounted sub-routers carry no path of their own
+        _ROUTE_SET = frozenset(filter(None, (getattr(route, "path", None) for route in app.routes)))
+        _API_CLIENT = TestClient(app)
+    return _API_CLIENT
+
 def test_api_structure():
     """Test FastAPI application structure"""
     print("🔍 Testing API structure...")
     
     try:
-        from main import app
-        from fastapi.testclient import TestClient
-        
-        client = TestClient(app)
+        client = _get_api_client()
         
         # Test health endpoint
         response = client.get("/health")
@@ -201,18 +207,12 @@ def test_api_structure():
         print("  ✅ Health endpoint working")
         
         # Test CORS configuration
-        assert len(app.middleware) > 0
+        assert len(client.app.user_middleware) > 0
         print("  ✅ Middleware configured")
         
         # Test route registration
-        routes = [route.path for route in app.routes]
-        expected_routes = ["/health", "/interviews", "/interviews/{interview_id}/turn", "/interviews/{interview_id}/summary"]
-        
-        for route in expected_routes:
-            # Check if route pattern exists (allowing for path parameters)
-            route_exists = any(route.replace("{interview_id}", "1") in r or route in r for r in routes)
-            if not route_exists:
-                print(f"  ⚠️ Route may be missing: {route}")
+        missing = EXPECTED_ROUTES - _ROUTE_SET
+        assert not missing, f"routes missing: {sorted(missing)}"
         
         print("  ✅ API structure working")
         return True
@@ -221,6 +221,36 @@ def test_api_structure():
         print(f"  ❌ API structure test failed: {e}")
         return False
 
+# Output buffer of the check running in the current context (None = print directly)
+_check_output: ContextVar = ContextVar("_check_output", default=None)
+
+class _CheckStdout:
+    """Stdout proxy that sends each concurrent check's prints to its own buffer"""
+    
+    def __init__(self, stream):
+        self._stream = stream
+    
+    def write(self, text):
+        buffer = _check_output.get()
+        return (buffer if buffer is not None else self._stream).write(text)
+    
+    def flush(self):
+        self._stream.flush()
+
+async def _run_buffered(test_func):
+    """Run one check (sync ones in a worker thread), returning its result and output"""
+    buffer = io.StringIO()
+    _check_output.set(buffer)  # to_thread copies this context into the worker
+    try:
+        if asyncio.iscoroutinefunction(test_func):
+            result = await test_func()
+        else:
+            result = await asyncio.to_thread(test_func)
+    except Exception as e:
+        print(f"  ❌ validation failed: {e}")
+        result = False
+    return result, buffer.getvalue()
+
 async def main():
     """Run all validation tests"""
     print("🚀 Excel Interviewer System Validation")
@@ -234,18 +264,19 @@ async def main():
         ("API Structure", test_api_structure)
     ]
     
-    results = {}
+    # The components are independent, so check them all at once
+    real_stdout = sys.stdout
+    sys.stdout = _CheckStdout(real_stdout)
+    try:
+        outcomes = await asyncio.gather(*(_run_buffered(test_func) for _, test_func in tests))
+    finally:
+        sys.stdout = real_stdout
     
-    for test_name, test_func in tests:
+    results = {}
+    for (test_name, _), (success, output) in zip(tests, outcomes):
         print(f"\n{test_name}:")
-        try:
-            if asyncio.iscoroutinefunction(test_func):
-                results[test_name] = await test_func()
-            else:
-                results[test_name] = test_func()
-        except Exception as e:
-            print(f"  ❌ {test_name} validation failed: {e}")
-            results[test_name] = False
+        print(output, end="")
+        results[test_name] = success
     
     # Print summary
     print(f"\n{'='*50}")